@@ -106,15 +106,16 @@ class Editor:
 
             # Handle left and right mouse clicks
             if self.clicking and self.ongrid:
-                self.tilemap.tilemap[str(tile_pos[0]) + ";" + str(tile_pos[1])] = {
-                    "type": self.tile_list[self.tile_group],
-                    "variant": self.tile_variant,
-                    "pos": tile_pos,
-                }
+                self.tilemap.set_tile(
+                    tile_pos,
+                    {
+                        "type": self.tile_list[self.tile_group],
+                        "variant": self.tile_variant,
+                        "pos": tile_pos,
+                    },
+                )
             if self.right_clicking:
-                tile_loc = str(tile_pos[0]) + ";" + str(tile_pos[1])
-                if tile_loc in self.tilemap.tilemap:
-                    del self.tilemap.tilemap[tile_loc]
+                self.tilemap.remove_tile(tile_pos)
 
             # Display the currently selected tile in the top left corner
             self.display.blit(current_tile_img, (5, 5))
@@ -5,6 +5,7 @@ import random
 import math
 
 # Importing installed modules
+import numpy as np
 import pygame
 
 # Imporing other modules
@@ -12,8 +13,10 @@ from scripts.utils import load_image, load_images, Animation
 from scripts.entity import Player
 from scripts.tilemap import Tilemap
 from scripts.clouds import Clouds
-from scripts.particle import Particle
-from scripts.spark import Spark
+from scripts.hud import Hud
+from scripts.effects import Transition, Silhouette
+from scripts.particle import ParticleSystem
+from scripts.spark import SparkSystem
 
 
 class Game:
@@ -28,6 +31,9 @@ class Game:
         self.display_2 = pygame.Surface(
             (320, 240)
         )  # Create a secondary display surface
+        self.scaled = pygame.Surface(
+            self.screen.get_size()
+        )  # Secondary display scaled to the window, reused every frame
 
         self.clock = pygame.time.Clock()
 
@@ -55,9 +61,21 @@ class Game:
 
         self.clouds = Clouds(self.assets["clouds"])  # Create clouds object
 
+        self.hud = Hud()  # Overlays, rendered again only when their values change
+        self.hud.add("countdown", (10, 0))
+
+        # Transition frames and silhouette buffers, drawn once and reused every frame
+        self.transition_effect = Transition(self.display.get_size())
+        self.silhouette = Silhouette(self.display.get_size())
+
         self.player = Player(self, (50, 50), (9, 20))  # Create player object
 
-        self.tilemap = Tilemap(self, tile_size=20)  # Create tilemap object
+        self.particles = ParticleSystem(self)  # Leaf and death burst particles
+        self.sparks = SparkSystem()
+
+        self.tilemap = Tilemap(
+            self, tile_size=20, cached=True
+        )  # Create tilemap object, drawn from baked chunks
 
         self.level = 0
         self.load_level(self.level)  # Load initial level
@@ -73,12 +91,14 @@ class Game:
             self.player.pos = spawner["pos"]
             self.player.air_time = 0
 
-        # Extract leaf spawner positions
-        self.leaf_spawner = []
-        for tree in self.tilemap.extract([("decor", 0)], keep=True):
-            self.leaf_spawner.append(
-                pygame.Rect(4 + tree["pos"][0], 4 + tree["pos"][1], 23, 13)
-            )
+        # Extract leaf spawner rects, one x, y, width, height row per tree
+        self.leaf_rects = np.array(
+            [
+                (4 + tree["pos"][0], 4 + tree["pos"][1], 23, 13)
+                for tree in self.tilemap.extract([("decor", 0)], keep=True)
+            ],
+            dtype=np.float64,
+        ).reshape(-1, 4)
 
         # Extract spike positions
         self.spikes = []
@@ -89,9 +109,9 @@ class Game:
         escape = self.tilemap.extract([("escape", 0)], keep=True)[0]
         self.escape_point = pygame.Rect(escape["pos"][0], escape["pos"][1], 14, 12)
 
-        # Initialize lists for particles and sparks
-        self.particles = []
-        self.sparks = []
+        # Remove the particles and sparks of the last level
+        self.particles.clear()
+        self.sparks.clear()
 
         # Scrolling, death handling parameters
         self.scroll = [0, 0]
@@ -148,22 +168,17 @@ class Game:
 
             render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
 
-            # Generate leaf particles
-            for rect in self.leaf_spawner:
-                if random.random() * 35555 < rect.width * rect.height:
-                    pos = (
-                        rect.x + random.random() * rect.width,
-                        rect.y + random.random() * rect.height,
-                    )
-                    self.particles.append(
-                        Particle(
-                            self,
-                            "leaf",
-                            pos,
-                            velocity=[-0.3, 0.4],
-                            frame=random.randint(0, 20),
-                        )
-                    )
+            # Generate leaf particles, each tree rolling once per frame
+            rects = self.leaf_rects
+            spawn = np.random.random(len(rects)) * 35555 < rects[:, 2] * rects[:, 3]
+            count = int(spawn.sum())
+            if count:
+                self.particles.emit(
+                    "leaf",
+                    rects[spawn, :2] + np.random.random((count, 2)) * rects[spawn, 2:],
+                    velocity=[-0.3, 0.4],
+                    frame=np.random.randint(0, 21, count),
+                )
 
             # Clouds rendering
             self.clouds.update()
@@ -188,60 +203,48 @@ class Game:
             if spikes_collisions and not self.dead:
                 self.dead = 1
                 self.screenshake = max(16, self.screenshake)
-                for i in range(10):
-                    angle = random.random() * math.pi * 2
-                    speed = random.random() * 5
-                    self.sparks.append(
-                        Spark(
-                            self.player.rect().center,
-                            angle,
-                            2 + random.random(),
-                        )
-                    )
-                    self.particles.append(
-                        Particle(
-                            self,
-                            "particle",
-                            self.player.rect().center,
-                            velocity=[
-                                math.cos(angle + math.pi) * speed * 0.5,
-                                math.sin(angle + math.pi) * speed * 0.5,
-                            ],
-                            frame=random.randint(0, 7),
-                        )
-                    )
+                angles = np.random.random(10) * math.pi * 2
+                speeds = np.random.random(10) * 5
+                self.sparks.emit(
+                    self.player.rect().center, angles, 2 + np.random.random(10)
+                )
+                self.particles.emit(
+                    "particle",
+                    np.tile(self.player.rect().center, (10, 1)),
+                    velocity=np.stack(
+                        [
+                            np.cos(angles + math.pi) * speeds * 0.5,
+                            np.sin(angles + math.pi) * speeds * 0.5,
+                        ],
+                        axis=1,
+                    ),
+                    frame=np.random.randint(0, 8, 10),
+                )
 
             # Create display silhouette
-            display_mask = pygame.mask.from_surface(self.display)
-            display_sillhouette = display_mask.to_surface(
-                setcolor=(0, 0, 0, 180), unsetcolor=(0, 0, 0, 0)
-            )
-            for offset in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                self.display_2.blit(display_sillhouette, offset)
+            self.silhouette.render(self.display, self.display_2)
 
             # Update and render sparks
-            for spark in self.sparks.copy():
-                kill = spark.update()
-                spark.render(self.display, offset=render_scroll)
-                if kill:
-                    self.sparks.remove(spark)
-
-            # Update and render particles
-            for particle in self.particles.copy():
-                kill = particle.update()
-                particle.render(self.display, offset=render_scroll)
-                if particle.type == "leaf":
-                    particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3
-                if kill:
-                    self.particles.remove(particle)
+            kill = self.sparks.update()
+            self.sparks.render(self.display, offset=render_scroll)
+            self.sparks.remove(kill)
+
+            # Update and render particles, leaves swaying as they fall
+            kill = self.particles.update()
+            self.particles.render(self.display, offset=render_scroll)
+            n = self.particles.count
+            leaves = self.particles.type[:n] == self.particles.types.index("leaf")
+            self.particles.pos[:n, 0] += np.where(
+                leaves, np.sin(self.particles.frame[:n] * 0.035) * 0.3, 0
+            )
+            self.particles.remove(kill)
 
             # Blit display onto secondary display
             self.display_2.blit(self.display, (0, 0))
 
             # Display countdown timer
-            font = pygame.font.SysFont("Times New Roman", 30)
-            img = font.render(str(self.countdown), True, (120, 120, 120))
-            self.display_2.blit(img, (10, 0))
+            self.hud.set("countdown", self.countdown)
+            self.hud.render(self.display_2)
             count_timer = pygame.time.get_ticks()
             if count_timer - self.last_count > 1000:
                 if self.countdown:
@@ -251,26 +254,15 @@ class Game:
                 self.last_count = count_timer
 
             # Display transition effect
-            if self.transition:
-                transition_surf = pygame.Surface(self.display.get_size())
-                pygame.draw.circle(
-                    transition_surf,
-                    (255, 255, 255),
-                    (self.display.get_width() // 2, self.display.get_height() // 2),
-                    (30 - abs(self.transition)) * 8,
-                )
-                transition_surf.set_colorkey((255, 255, 255))
-                self.display_2.blit(transition_surf, (0, 0))
+            self.transition_effect.render(self.display_2, self.transition)
 
             # Apply screenshake effect
             screenshake_offset = (
                 random.random() * self.screenshake - self.screenshake / 2,
                 random.random() * self.screenshake - self.screenshake / 2,
             )
-            self.screen.blit(
-                pygame.transform.scale(self.display_2, self.screen.get_size()),
-                screenshake_offset,
-            )
+            pygame.transform.scale(self.display_2, self.screen.get_size(), self.scaled)
+            self.screen.blit(self.scaled, screenshake_offset)
             pygame.display.update()
 
             self.clock.tick(60)
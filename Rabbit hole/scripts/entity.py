@@ -74,7 +74,7 @@ class PhysicsEntity:
     def render(self, surf, offset=(0, 0)):
         # Blit the entity's current animation frame onto the surface
         surf.blit(
-            pygame.transform.flip(self.animation.img(), self.flip, False),
+            self.animation.img(self.flip),
             (
                 self.pos[0] - offset[0],
                 self.pos[1] - offset[1],
@@ -0,0 +1,62 @@
+# Importing installed modules
+import pygame
+
+
+# Class for a text overlay that is only rendered again when its value changes
+class HudText:
+    def __init__(self, font, pos, color, fmt="{}", cache_size=256):
+        self.font = font
+        self.pos = pos
+        self.color = color
+        self.fmt = fmt  # Format string applied to the value
+        self.cache_size = cache_size
+        self.cache = {}  # Rendered surfaces by text, e.g. every countdown number
+        self.value = None
+        self.img = None
+
+    # Method to change the shown value, reusing the surface rendered for it before
+    def set(self, value):
+        if value == self.value and self.img is not None:
+            return
+        self.value = value
+        text = self.fmt.format(value)
+        if text not in self.cache:
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()  # Values that never repeat, e.g. FPS
+            self.cache[text] = self.font.render(text, True, self.color)
+        self.img = self.cache[text]
+
+
+# Class for the overlays drawn on top of the game, with fonts created only once
+class Hud:
+    def __init__(self):
+        self.fonts = {}  # Fonts by (name, size)
+        self.items = {}  # Overlays by name, drawn in the order they were added
+
+    # Method to get a font, creating it the first time
+    def font(self, name, size):
+        if (name, size) not in self.fonts:
+            self.fonts[(name, size)] = pygame.font.SysFont(name, size)
+        return self.fonts[(name, size)]
+
+    # Method to add a text overlay
+    def add(
+        self,
+        name,
+        pos,
+        font=("Times New Roman", 30),
+        color=(120, 120, 120),
+        fmt="{}",
+    ):
+        self.items[name] = HudText(self.font(*font), pos, color, fmt)
+        return self.items[name]
+
+    # Method to change the value shown by an overlay
+    def set(self, name, value):
+        self.items[name].set(value)
+
+    # Method to draw every overlay that has a value
+    def render(self, surf):
+        for item in self.items.values():
+            if item.img is not None:
+                surf.blit(item.img, item.pos)
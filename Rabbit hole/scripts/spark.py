@@ -1,59 +1,68 @@
-# Importing built-in modules
-import math
-
 # Importing installed modules
+import numpy as np
 import pygame
 
 
-class Spark:
-    def __init__(self, pos, angle, speed):
-        self.pos = list(pos)  # Convert position tuple to a mutable list
-        self.angle = angle  # Set the angle of movement
-        self.speed = speed  # Set the initial speed
+# Class for updating many sparks at once from preallocated arrays
+class SparkSystem:
+    def __init__(self, capacity=64):
+        self.count = 0  # Live sparks are the first count rows of every array
+        self.pos = np.zeros((capacity, 2))
+        self.direction = np.zeros((capacity, 2))  # Cosine and sine of the angle
+        self.speed = np.zeros(capacity)
 
-    def update(self):
-        # Update position based on current angle and speed
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
+    # Method to remove every spark
+    def clear(self):
+        self.count = 0
 
-        # Gradually decrease speed over time
-        self.speed = max(0, self.speed - 0.1)
+    # Method to add a batch of sparks
+    def emit(self, pos, angles, speeds):
+        angles = np.asarray(angles, dtype=np.float64).reshape(-1)
+        start = self.count
+        end = start + len(angles)
+        if end > len(self.pos):
+            # Double the arrays until the new sparks fit
+            capacity = len(self.pos)
+            while capacity < end:
+                capacity *= 2
+            for name in ["pos", "direction", "speed"]:
+                old = getattr(self, name)
+                new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[:start] = old[:start]
+                setattr(self, name, new)
 
-        # Return True if speed is zero (spark should be removed)
-        return not self.speed
+        self.pos[start:end] = pos
+        self.direction[start:end, 0] = np.cos(angles)
+        self.direction[start:end, 1] = np.sin(angles)
+        self.speed[start:end] = speeds
+        self.count = end
 
+    # Method to move and slow down every spark, returning the ones that stopped
+    def update(self):
+        n = self.count
+        self.pos[:n] += self.direction[:n] * self.speed[:n, None]
+        self.speed[:n] = np.maximum(0, self.speed[:n] - 0.1)
+        return self.speed[:n] == 0
+
+    # Method to draw every spark as a diamond along its direction
     def render(self, surf, offset=(0, 0)):
-        # Calculate points to draw the spark's shape based on its position, angle, and speed
-        render_points = [
-            (
-                self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0],
-                self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1],
-            ),
-            (
-                self.pos[0]
-                + math.cos(self.angle + math.pi * 0.5) * self.speed * 0.5
-                - offset[0],
-                self.pos[1]
-                + math.sin(self.angle + math.pi * 0.5) * self.speed * 0.5
-                - offset[1],
-            ),
-            (
-                self.pos[0]
-                + math.cos(self.angle + math.pi) * self.speed * 3
-                - offset[0],
-                self.pos[1]
-                + math.sin(self.angle + math.pi) * self.speed * 3
-                - offset[1],
-            ),
-            (
-                self.pos[0]
-                + math.cos(self.angle - math.pi * 0.5) * self.speed * 0.5
-                - offset[0],
-                self.pos[1]
-                + math.sin(self.angle - math.pi * 0.5) * self.speed * 0.5
-                - offset[1],
-            ),
-        ]
-
-        # Draw a polygon representing the spark on the surface
-        pygame.draw.polygon(surf, (255, 255, 255), render_points)
+        n = self.count
+        center = self.pos[:n] - offset
+        forward = self.direction[:n] * self.speed[:n, None] * 3
+        side = self.direction[:n, ::-1] * [-1, 1] * self.speed[:n, None] * 0.5
+        points = np.stack(
+            [center + forward, center + side, center - forward, center - side], axis=1
+        )
+        for polygon in points.tolist():
+            pygame.draw.polygon(surf, (255, 255, 255), polygon)
+
+    # Method to drop the sparks in the mask
+    def remove(self, mask):
+        n = self.count
+        keep = ~mask[:n]
+        m = int(keep.sum())
+        if m == n:
+            return
+        for array in [self.pos, self.direction, self.speed]:
+            array[:m] = array[:n][keep]
+        self.count = m
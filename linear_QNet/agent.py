@@ -1,6 +1,7 @@
 # Importing built-in modules
+import argparse
+import atexit
 import random
-from collections import deque
 
 # Importing installed modules
 import torch
@@ -8,97 +9,227 @@ import numpy as np
 
 # Imporing other modules
 from game import GameAI
-from model import Linear_QNet, QTrainer
+from model import Linear_QNet, QTrainer, NumpyQNet
+from vec_env import VecGameAI
+from replay import ReplayBuffer, PrioritizedReplayBuffer
+from qcache import QValueCache
+from tabular import QTable, TabularTrainer
+from trajectory import TrajectoryRecorder
+from scripts.timing import timer
 
 
 MAX_MEMORY = 100_000
 BATCH_SIZE = 1000
 LR = 0.001
+TABULAR_LR = 0.1
 
 
 class Agent:
 
-    def __init__(self):
+    def __init__(
+        self,
+        prioritized=False,
+        memory=None,
+        engine="neural",
+        inference="torch",
+        cache_size=0,
+        cache_refresh=1,
+        **trainer_options,
+    ):
         self.n_games = 1
         self.epsilon = 0  # randomness
         self.gamma = 0.9  # discount rate
-        self.memory = deque(maxlen=MAX_MEMORY)  # popleft()
-        self.model = Linear_QNet(20, [256, 256], 3)
-        self.trainer = QTrainer(self.model, lr=LR, gamma=self.gamma)
+        self.prioritized = prioritized  # replay by TD error instead of uniformly
+        if memory is not None:
+            self.memory = memory  # e.g. a buffer shared with other processes
+        elif self.prioritized:
+            self.memory = PrioritizedReplayBuffer(MAX_MEMORY, 20)
+        else:
+            self.memory = ReplayBuffer(MAX_MEMORY, 20)  # overwrites the oldest
+        self.engine = engine  # "neural" or "tabular"
+        if self.engine == "tabular":
+            # Table of Q values by state, a cheap baseline for the network
+            if any(trainer_options.values()):
+                raise ValueError("target networks need the neural engine")
+            self.model = QTable(20, 3)
+            self.trainer = TabularTrainer(self.model, lr=TABULAR_LR, gamma=self.gamma)
+        else:
+            self.model = Linear_QNet(20, [256, 256], 3)
+            self.trainer = QTrainer(
+                self.model, lr=LR, gamma=self.gamma, **trainer_options
+            )  # e.g. target_sync, tau, double
         self.loss = None
 
+        # Action selection runs without autograd, from a preallocated input tensor,
+        # or with NumPy alone when inference is "numpy" or the engine is tabular
+        self.state_tensor = torch.zeros(20)
+        self.state_array = self.state_tensor.numpy()  # Shares memory with the tensor
+        self.policy = None
+        if self.engine == "tabular":
+            self.policy = self.model
+        elif inference == "numpy":
+            self.policy = NumpyQNet(self.model)
+
+        # Optional cache of the Q values of repeated states, refreshed after
+        # cache_refresh network updates
+        self.cache = None
+        if cache_size:
+            self.cache = QValueCache(cache_size, cache_refresh)
+
     def get_state(self, game):
-        state = [
-            int(
-                not game.no_tile_right and not game.player.collisions["down"]
-            ),  # no tile right
-            int(
-                not game.no_tile_left and not game.player.collisions["down"]
-            ),  # no tile left
-            int(bool(game.spike_warning_right)),  # spike right
-            int(bool(game.spike_warning_left)),  # spike left
-            int(
-                game.player.rect().move(20, 0).colliderect(game.escape_point)
-            ),  # escape point right
-            int(
-                game.player.rect().move(-20, 0).colliderect(game.escape_point)
-            ),  # escape point left
-            int(game.movement[1] - game.movement[0] > 0),  # direction right
-            int(game.movement[1] - game.movement[0] < 0),  # direction left
-            int(
-                bool(game.movement[1] - game.movement[0] == 0 and game.player.jumps)
-            ),  # player standing
-            int(not game.player.jumps),  # player jumps
-            int(game.player.collisions["left"]),  # collision left
-            int(game.player.collisions["right"]),  # collision right
-            int(game.player.collisions["up"]),  # collision up
-            int(game.player.collisions["down"]),  # collision down
-            game.level,  # map level
-            game.player.velocity[0],  # x velocity
-            game.player.velocity[1],  # y velocity
-            game.countdown,  # time
-            game.player.pos[1],  # y position
-            game.distance,  # distance between agent and escape point
-        ]
-        return np.array(state, dtype=int)
+        with timer.phase("agent/get_state"):
+            state = [
+                int(
+                    not game.no_tile_right and not game.player.collisions["down"]
+                ),  # no tile right
+                int(
+                    not game.no_tile_left and not game.player.collisions["down"]
+                ),  # no tile left
+                int(bool(game.spike_warning_right)),  # spike right
+                int(bool(game.spike_warning_left)),  # spike left
+                int(
+                    game.player.rect().move(20, 0).colliderect(game.escape_point)
+                ),  # escape point right
+                int(
+                    game.player.rect().move(-20, 0).colliderect(game.escape_point)
+                ),  # escape point left
+                int(game.movement[1] - game.movement[0] > 0),  # direction right
+                int(game.movement[1] - game.movement[0] < 0),  # direction left
+                int(
+                    bool(game.movement[1] - game.movement[0] == 0 and game.player.jumps)
+                ),  # player standing
+                int(not game.player.jumps),  # player jumps
+                int(game.player.collisions["left"]),  # collision left
+                int(game.player.collisions["right"]),  # collision right
+                int(game.player.collisions["up"]),  # collision up
+                int(game.player.collisions["down"]),  # collision down
+                game.level,  # map level
+                game.player.velocity[0],  # x velocity
+                game.player.velocity[1],  # y velocity
+                game.countdown,  # time
+                game.player.pos[1],  # y position
+                game.distance,  # distance between agent and escape point
+            ]
+            return np.array(state, dtype=int)
 
     def remember(self, state, action, reward, next_state, done):
         self.memory.append(
-            (state, action, reward, next_state, done)
-        )  # popleft if MAX_MEMORY is reached
+            state, action.index(1), reward, next_state, done
+        )  # overwrite the oldest if MAX_MEMORY is reached
 
     def train_long_memory(self):
-        if len(self.memory) > BATCH_SIZE:
-            mini_sample = random.sample(self.memory, BATCH_SIZE)
-        else:
-            mini_sample = self.memory
+        with timer.phase("agent/train_long_memory"):
+            if self.prioritized:
+                *batch, indices, weights = self.memory.sample(BATCH_SIZE)
+                loss = self.trainer.train_batch(*batch, weights=weights)
+                self.memory.update_priorities(indices, self.trainer.td_errors)
+            else:
+                states, actions, rewards, next_states, dones = self.memory.sample(
+                    BATCH_SIZE
+                )
+                loss = self.trainer.train_batch(
+                    states, actions, rewards, next_states, dones
+                )
+            return loss
 
-        states, actions, rewards, next_states, dones = zip(*mini_sample)
-        self.trainer.train_step(states, actions, rewards, next_states, dones)
+    def remember_batch(self, states, actions, rewards, next_states, dones):
+        self.memory.extend(
+            states, actions.argmax(axis=1), rewards, next_states, dones
+        )  # overwrite the oldest if MAX_MEMORY is reached
 
     def train_short_memory(self, state, action, reward, next_state, done):
-        self.loss = self.trainer.train_step(state, action, reward, next_state, done)
+        with timer.phase("agent/train_short_memory"):
+            self.loss = self.trainer.train_step(state, action, reward, next_state, done)
 
-    def get_action(self, state):
-        final_move = [0, 0, 0]
-        self.epsilon = 80 - self.n_games
-        if random.randint(0, 200) < self.epsilon:
-            final_move[random.randint(0, 2)] = 1
+    def train_short_memory_batch(self, states, actions, rewards, next_states, dones):
+        with timer.phase("agent/train_short_memory"):
+            self.loss = self.trainer.train_batch(
+                torch.from_numpy(states.astype(np.float32)),
+                torch.from_numpy(actions.argmax(axis=1)),
+                torch.from_numpy(rewards),
+                torch.from_numpy(next_states.astype(np.float32)),
+                torch.from_numpy(dones),
+            )
+
+    # Method to get the Q values of a state or a batch of states for acting
+    def predict(self, state):
+        if self.cache is not None and state.ndim == 1:
+            key = self.cache.key(state)
+            q_values = self.cache.get(key, self.trainer.updates)
+            if q_values is None:
+                q_values = self.forward(state)
+                self.cache.put(key, q_values)
+            return q_values
+        return self.forward(state)
+
+    # Method to run the network for acting, without autograd
+    def forward(self, state):
+        if self.policy is not None:
+            return self.policy.forward(state)
+        if state.ndim == 1:
+            self.state_array[:] = state
+            state = self.state_tensor
         else:
-            state0 = torch.tensor(state, dtype=torch.float)
-            prediction = self.model(state0)
-            move = torch.argmax(prediction).item()
-            final_move[move] = 1
-        return final_move
+            state = torch.from_numpy(state.astype(np.float32))
+        with torch.inference_mode():
+            return self.model(state).numpy()
 
+    def get_action(self, state):
+        with timer.phase("agent/get_action"):
+            final_move = [0, 0, 0]
+            self.epsilon = 80 - self.n_games
+            if random.randint(0, 200) < self.epsilon:
+                final_move[random.randint(0, 2)] = 1
+            else:
+                prediction = self.predict(state)
+                move = int(prediction.argmax())
+                final_move[move] = 1
+            return final_move
+
+    def get_actions(self, states):
+        with timer.phase("agent/get_action"):
+            # Pick moves for a batch of states with a single forward pass
+            final_moves = np.zeros((len(states), 3), dtype=int)
+            self.epsilon = 80 - self.n_games
+            moves = self.predict(states).argmax(axis=1)
+            explore = np.random.randint(0, 201, len(states)) < self.epsilon
+            moves[explore] = np.random.randint(0, 3, explore.sum())
+            final_moves[np.arange(len(states)), moves] = 1
+            return final_moves
 
-def train():
+
+def train(
+    headless=False,
+    render_every=0,
+    effects=True,
+    prioritized=False,
+    update_every=1,
+    max_steps=None,
+    engine="neural",
+    inference="torch",
+    cache_size=0,
+    cache_refresh=1,
+    record_path=None,
+    **trainer_options,
+):
     record = 0
     print_flag = True
-    agent = Agent()
-    game = GameAI()
+    steps = 0  # Steps the agent acted on, the update_every count
+    agent = Agent(
+        prioritized=prioritized,
+        engine=engine,
+        inference=inference,
+        cache_size=cache_size,
+        cache_refresh=cache_refresh,
+        **trainer_options,
+    )
+    game = GameAI(headless=headless, render_every=render_every, effects=effects)
+    recorder = None
+    if record_path is not None:
+        recorder = TrajectoryRecorder(record_path)
+        atexit.register(recorder.close)  # Keep the buffered block on Ctrl+C
     loss_list = []
-    while True:
+    while max_steps is None or game.steps < max_steps:
         if game.dead > 1 or game.completed:
             game.play_step()
         else:
@@ -109,35 +240,293 @@ def train():
             final_move = agent.get_action(state_old)
 
             # perform move and get new state
+            level = game.level
             reward, score, done = game.play_step(action=final_move)
             state_new = agent.get_state(game)
 
-            # train short memory
-            agent.train_short_memory(state_old, final_move, reward, state_new, done)
+            # train short memory, or a replay batch every update_every steps
+            steps += 1
+            if update_every == 1:
+                agent.train_short_memory(state_old, final_move, reward, state_new, done)
+            elif steps % update_every == 0:
+                agent.loss = agent.train_long_memory()
 
             # remember
             agent.remember(state_old, final_move, reward, state_new, done)
+            if recorder is not None:
+                recorder.record(
+                    state_old, final_move.index(1), reward, done, level, agent.n_games
+                )
 
             if done:
                 agent.n_games += 1
                 agent.train_long_memory()
                 print_flag = True
-                print("Average loss:", sum(loss_list) / len(loss_list))
+                if loss_list:
+                    print("Average loss:", sum(loss_list) / len(loss_list))
                 loss_list = []
 
             if score > record:
                 record = score
                 agent.model.save()
                 print("Game", agent.n_games, "Score", score, "Record:", record)
-                print("Average loss:", sum(loss_list) / len(loss_list))
+                if loss_list:
+                    print("Average loss:", sum(loss_list) / len(loss_list))
                 loss_list = []
 
             if agent.n_games % 100 == 0 and agent.n_games > 0 and print_flag:
                 print("Echops:", agent.n_games)
+                if agent.cache is not None:
+                    print("Q value cache:", agent.cache.summary())
                 print_flag = False
 
+            # log the loss of the update made this step, if any
+            if agent.loss is not None:
+                loss_list.append(agent.loss.item())
+                agent.loss = None
+
+        timer.step()
+
+    if recorder is not None:
+        recorder.close()
+
+
+def train_vectorized(
+    num_envs,
+    levels=(0,),
+    render_every=0,
+    effects=True,
+    prioritized=False,
+    update_every=1,
+    engine="neural",
+    inference="torch",
+    **trainer_options,
+):
+    # Scores are the levels reached, so only passing the starting levels is a record
+    record = max(levels)
+    reported = 0
+    steps = 0
+    agent = Agent(
+        prioritized=prioritized, engine=engine, inference=inference, **trainer_options
+    )
+    envs = VecGameAI(
+        num_envs,
+        agent.get_state,
+        levels=levels,
+        render_every=render_every,
+        effects=effects,
+    )
+    loss_list = []
+    while True:
+        # get old states and moves for all games
+        states_old = envs.states.copy()
+        final_moves = agent.get_actions(states_old)
+
+        # perform moves and get new states
+        states_new, rewards, dones, scores = envs.step(final_moves)
+
+        # train short memory on the whole batch, or a replay batch every
+        # update_every steps
+        steps += 1
+        if update_every == 1:
+            agent.train_short_memory_batch(
+                states_old, final_moves, rewards, states_new, dones
+            )
+        elif steps % update_every == 0:
+            agent.loss = agent.train_long_memory()
+        if agent.loss is not None:
             loss_list.append(agent.loss.item())
+            agent.loss = None
+
+        # remember
+        agent.remember_batch(states_old, final_moves, rewards, states_new, dones)
+
+        if dones.any():
+            agent.n_games += int(dones.sum())
+            agent.train_long_memory()
+            if loss_list:
+                print("Average loss:", sum(loss_list) / len(loss_list))
+            loss_list = []
+
+        if scores.max() > record:
+            record = int(scores.max())
+            agent.model.save()
+            print("Game", agent.n_games, "Score", record, "Record:", record)
+
+        if agent.n_games // 100 > reported:
+            reported = agent.n_games // 100
+            print("Echops:", reported * 100)
+
+        timer.step()
 
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train the Rabbit Hole agent")
+    parser.add_argument(
+        "--headless", action="store_true", help="skip rendering and the FPS cap"
+    )
+    parser.add_argument(
+        "--render-every",
+        type=int,
+        default=0,
+        help="in headless mode, render every Nth step for spot-checking",
+    )
+    parser.add_argument(
+        "--no-effects",
+        action="store_true",
+        help="skip leaves, sparks and particles when rendering",
+    )
+    parser.add_argument(
+        "--prioritized", action="store_true", help="use prioritized experience replay"
+    )
+    parser.add_argument(
+        "--envs",
+        type=int,
+        default=1,
+        help="number of headless games stepped in lockstep (per actor)",
+    )
+    parser.add_argument(
+        "--levels",
+        type=int,
+        nargs="+",
+        default=[0],
+        help="levels the vectorized games start on, assigned round-robin",
+    )
+    parser.add_argument(
+        "--actors",
+        type=int,
+        default=0,
+        help="number of actor processes feeding a separate learner process",
+    )
+    parser.add_argument(
+        "--update-every",
+        type=int,
+        default=1,
+        help="train on a replay batch every N steps instead of every single step",
+    )
+    parser.add_argument(
+        "--target-sync",
+        type=int,
+        default=0,
+        help="bootstrap from a target network synced every N updates",
+    )
+    parser.add_argument(
+        "--tau",
+        type=float,
+        default=None,
+        help="Polyak average the target network by this factor on each sync",
+    )
+    parser.add_argument("--double", action="store_true", help="use Double DQN targets")
+    parser.add_argument(
+        "--engine",
+        choices=["neural", "tabular"],
+        default="neural",
+        help="learn Q values with the network or with a table of seen states",
+    )
+    parser.add_argument(
+        "--inference",
+        choices=["torch", "numpy"],
+        default="torch",
+        help="run action selection through torch or a NumPy copy of the network",
+    )
+    parser.add_argument(
+        "--q-cache",
+        type=int,
+        default=0,
+        help="cache the Q values of up to N recently seen states",
+    )
+    parser.add_argument(
+        "--q-cache-refresh",
+        type=int,
+        default=1,
+        help="drop the cached Q values every N network updates (0 never drops them)",
+    )
+    parser.add_argument(
+        "--record",
+        default=None,
+        help="stream every transition to this new trajectory file",
+    )
+    parser.add_argument(
+        "--timing", action="store_true", help="time each phase of every step"
+    )
+    parser.add_argument(
+        "--timing-every",
+        type=int,
+        default=1000,
+        help="dump the phase timings every N steps",
+    )
+    parser.add_argument(
+        "--timing-file",
+        default=None,
+        help="append the phase timings to this file as JSON lines",
+    )
+    parser.add_argument(
+        "--profile-steps",
+        type=int,
+        default=0,
+        help="run cProfile over the first N steps, and N more on each SIGUSR1",
+    )
+    parser.add_argument(
+        "--profile-file", default=None, help="write the cProfile stats to this file"
+    )
+    args = parser.parse_args()
+
+    if args.timing:
+        timer.configure(dump_every=args.timing_every, path=args.timing_file)
+    if args.profile_steps:
+        timer.profile_on_signal(args.profile_steps, args.profile_file)
+        timer.profile(args.profile_steps, args.profile_file)
+
+    trainer_options = {
+        "target_sync": args.target_sync,
+        "tau": args.tau,
+        "double": args.double,
+    }
+    if (args.tau is not None or args.double) and not args.target_sync:
+        parser.error("--tau and --double need a target network, set --target-sync")
+    if args.target_sync and args.engine != "neural":
+        parser.error("target networks need the neural engine")
+    if args.actors and args.engine != "neural":
+        parser.error("--actors needs the neural engine")
+    if args.actors and args.prioritized:
+        parser.error("--prioritized needs a single learner")
+    if args.q_cache and (args.actors or args.envs > 1):
+        parser.error("--q-cache works with a single game")
+    if args.record and (args.actors or args.envs > 1):
+        parser.error("--record works with a single game")
+    if args.actors:
+        from distributed import train_distributed
+
+        train_distributed(
+            args.actors,
+            envs_per_actor=args.envs,
+            levels=args.levels,
+            inference=args.inference,
+            **trainer_options,
+        )
+    elif args.envs > 1:
+        train_vectorized(
+            args.envs,
+            levels=args.levels,
+            render_every=args.render_every,
+            effects=not args.no_effects,
+            prioritized=args.prioritized,
+            update_every=args.update_every,
+            engine=args.engine,
+            inference=args.inference,
+            **trainer_options,
+        )
+    else:
+        train(
+            headless=args.headless,
+            render_every=args.render_every,
+            effects=not args.no_effects,
+            prioritized=args.prioritized,
+            update_every=args.update_every,
+            engine=args.engine,
+            inference=args.inference,
+            cache_size=args.q_cache,
+            cache_refresh=args.q_cache_refresh,
+            record_path=args.record,
+            **trainer_options,
+        )
@@ -0,0 +1,385 @@
+# Importing built-in modules
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+
+# Importing installed modules
+import numpy as np
+import pygame
+import torch
+
+# Imporing other modules
+import model
+from agent import Agent, train, MAX_MEMORY, BATCH_SIZE
+from game import GameAI
+from model import Linear_QNet, QTrainer, NumpyQNet
+from replay import ReplayBuffer, PrioritizedReplayBuffer
+from tabular import QTable, TabularTrainer
+from trajectory import TrajectoryRecorder, TrajectoryReader
+from scripts.physics import OccupancyGrid, BatchPlayers
+
+
+# Function to seed every random number generator used during training
+def seed_everything(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+# Function to summarize a list of durations in seconds as microsecond percentiles
+def percentiles(durations, prefix):
+    values = np.array(durations) * 1e6
+    return {
+        prefix + "_p50_us": float(np.percentile(values, 50)),
+        prefix + "_p90_us": float(np.percentile(values, 90)),
+        prefix + "_p99_us": float(np.percentile(values, 99)),
+    }
+
+
+# Function to fill a replay buffer with random transitions
+def fill_buffer(buffer, count, seed=0):
+    rng = np.random.default_rng(seed)
+    states = rng.integers(0, 5, (count, 20))
+    for i in range(count):
+        buffer.append(states[i], i % 3, rng.normal(), states[i], i % 100 == 0)
+    if isinstance(buffer, PrioritizedReplayBuffer):
+        buffer.update_priorities(np.arange(count), rng.normal(size=count) * 10)
+
+
+# Function to measure simulated steps per second of a headless GameAI
+def bench_play_step(steps=3000, seed=0):
+    seed_everything(seed)
+    game = GameAI(headless=True)
+    actions = [[0, 0, 0] for _ in range(steps)]
+    for action in actions:
+        action[random.randint(0, 2)] = 1
+
+    start = time.perf_counter()
+    for action in actions:
+        game.play_step(action=action)
+    return {"play_step_steps_per_sec": steps / (time.perf_counter() - start)}
+
+
+# Function to measure render time and the pygame Surfaces and Masks created per frame
+def bench_render(frames=600, seed=0):
+    seed_everything(seed)
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Time drawing, not the window
+    game = GameAI(headless=True, render_every=1)
+    game.render_every = 0  # Frames are rendered and timed separately below
+
+    # Count the allocating pygame calls the render code can make
+    counts = {"allocs": 0}
+    originals = (pygame.Surface, pygame.mask.from_surface, pygame.transform.scale)
+
+    class CountingSurface(pygame.Surface):
+        def __init__(self, *args, **kwargs):
+            counts["allocs"] += 1
+            super().__init__(*args, **kwargs)
+
+    def from_surface(*args, **kwargs):
+        counts["allocs"] += 2  # The mask and the surface it was drawn to
+        return originals[1](*args, **kwargs)
+
+    def scale(surface, size, *dest_surface):
+        counts["allocs"] += not dest_surface
+        return originals[2](surface, size, *dest_surface)
+
+    pygame.Surface = CountingSurface
+    pygame.mask.from_surface = from_surface
+    pygame.transform.scale = scale
+    try:
+        times = []
+        for _ in range(frames):
+            action = [0, 0, 0]
+            action[random.randint(0, 2)] = 1
+            game.play_step(action=action)
+            start = time.perf_counter()
+            game.render((int(game.scroll[0]), int(game.scroll[1])))
+            times.append(time.perf_counter() - start)
+    finally:
+        pygame.Surface, pygame.mask.from_surface, pygame.transform.scale = originals
+    return {
+        "render_ms": float(np.mean(times)) * 1000,
+        "render_allocs_per_frame": counts["allocs"] / frames,
+    }
+
+
+# Function to measure the latency of Agent.get_state and Agent.get_action
+def bench_agent_latency(calls=3000, seed=0):
+    seed_everything(seed)
+    game = GameAI(headless=True)
+    agent = Agent()
+    agent.n_games = 100  # Past the exploration phase, always run the network
+    state_times = []
+    action_times = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        state = agent.get_state(game)
+        state_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        action = agent.get_action(state)
+        action_times.append(time.perf_counter() - start)
+
+        game.play_step(action=action)
+    return {
+        **percentiles(state_times, "get_state"),
+        **percentiles(action_times, "get_action"),
+    }
+
+
+# Function to compare the per-call latency of the ways to run the network for acting
+def bench_inference(batch_sizes=(1, 32, 256), calls=2000, seed=0):
+    seed_everything(seed)
+    agent = Agent()
+    policy = NumpyQNet(agent.model)
+    results = {}
+    for batch_size in batch_sizes:
+        states = np.random.randint(0, 5, (batch_size, 20))
+        if batch_size == 1:
+            states = states[0]
+        paths = {
+            # What get_action did before: a new tensor and autograd bookkeeping
+            "autograd": lambda: agent.model(
+                torch.tensor(states, dtype=torch.float)
+            ).detach(),
+            "inference_mode": lambda: agent.predict(states),
+            "numpy": lambda: policy.forward(states),
+        }
+        for name, path in paths.items():
+            path()  # Warm up
+            start = time.perf_counter()
+            for _ in range(calls):
+                path()
+            results[name + "_" + str(batch_size) + "_us"] = (
+                (time.perf_counter() - start) / calls * 1e6
+            )
+    return results
+
+
+# Function to measure get_action during greedy rollouts of the saved model, with
+# and without the Q value cache
+def bench_qcache(steps=5000, cache_size=65_536, seed=0):
+    results = {}
+    for name, size in [("uncached", 0), ("cached", cache_size)]:
+        seed_everything(seed)
+        game = GameAI(headless=True)
+        agent = Agent(cache_size=size, cache_refresh=0)  # Frozen network
+        agent.model.load_state_dict(torch.load("model/model.pth"))
+        agent.n_games = 100  # Past the exploration phase, always run the network
+        action_times = []
+        for _ in range(steps):
+            if game.dead > 1 or game.completed:
+                game.play_step()
+                continue
+            state = agent.get_state(game)
+            start = time.perf_counter()
+            action = agent.get_action(state)
+            action_times.append(time.perf_counter() - start)
+            game.play_step(action=action)
+        results["get_action_" + name + "_us"] = float(np.mean(action_times)) * 1e6
+        if agent.cache is not None:
+            results["cache_hit_rate"] = agent.cache.hit_rate()
+    return results
+
+
+# Function to measure the mean time of a QTrainer update at several batch sizes
+def bench_train_step(batch_sizes=(1, 32, 256, BATCH_SIZE), repeats=50, seed=0):
+    seed_everything(seed)
+    trainer = QTrainer(Linear_QNet(20, [256, 256], 3), lr=0.001, gamma=0.9)
+    results = {}
+    for batch_size in batch_sizes:
+        batch = (
+            torch.randint(0, 5, (batch_size, 20)).float(),
+            torch.randint(0, 3, (batch_size,)),
+            torch.randn(batch_size),
+            torch.randint(0, 5, (batch_size, 20)).float(),
+            torch.rand(batch_size) < 0.01,
+        )
+        trainer.train_batch(*batch)  # Warm up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            trainer.train_batch(*batch)
+        results["train_batch_" + str(batch_size) + "_ms"] = (
+            (time.perf_counter() - start) / repeats * 1000
+        )
+    return results
+
+
+# Function to measure transitions learned per second by the tabular and neural
+# engines, one at a time and in replay batches
+def bench_engines(batch_sizes=(1, BATCH_SIZE), repeats=200, seed=0):
+    seed_everything(seed)
+    trainers = {
+        "tabular": TabularTrainer(QTable(20, 3), lr=0.1, gamma=0.9),
+        "neural": QTrainer(Linear_QNet(20, [256, 256], 3), lr=0.001, gamma=0.9),
+    }
+    results = {}
+    for batch_size in batch_sizes:
+        buffer = ReplayBuffer(MAX_MEMORY, 20, seed=seed)
+        fill_buffer(buffer, 10_000, seed=seed)
+        batches = [buffer.sample(batch_size) for _ in range(repeats)]
+        for name, trainer in trainers.items():
+            start = time.perf_counter()
+            for batch in batches:
+                trainer.train_batch(*batch)
+            results[name + "_" + str(batch_size) + "_updates_per_sec"] = (
+                repeats * batch_size / (time.perf_counter() - start)
+            )
+    return results
+
+
+# Function to measure replay append cost and batch sampling cost at several sizes
+def bench_replay(sizes=(2_000, 10_000, MAX_MEMORY), repeats=100, seed=0):
+    results = {}
+    for buffer_type in [ReplayBuffer, PrioritizedReplayBuffer]:
+        name = buffer_type.__name__
+        for size in sizes:
+            buffer = buffer_type(MAX_MEMORY, 20, seed=seed)
+            start = time.perf_counter()
+            fill_buffer(buffer, size, seed=seed)
+            results[name + "_append_" + str(size) + "_us"] = (
+                (time.perf_counter() - start) / size * 1e6
+            )
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                buffer.sample(BATCH_SIZE)
+            results[name + "_sample_" + str(size) + "_ms"] = (
+                (time.perf_counter() - start) / repeats * 1000
+            )
+    return results
+
+
+# Function to measure the cost of recording a transition and of reading slices and
+# random samples back from a trajectory file
+def bench_trajectory(count=200_000, batch_size=BATCH_SIZE, repeats=100, seed=0):
+    rng = np.random.default_rng(seed)
+    states = rng.integers(0, 5, (1000, 20))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bench.traj")
+        recorder = TrajectoryRecorder(path)
+        start = time.perf_counter()
+        for i in range(count):
+            recorder.record(states[i % 1000], i % 3, 0.5, i % 100 == 99, 0, i // 100)
+        recorder.close()
+        results = {"record_us": (time.perf_counter() - start) / count * 1e6}
+
+        reader = TrajectoryReader(path, seed=seed)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            reader.sample(batch_size)
+        results["read_sample_ms"] = (time.perf_counter() - start) / repeats * 1000
+
+        start = time.perf_counter()
+        for _ in reader.iter_batches(batch_size):
+            pass
+        results["read_sequential_ms"] = (
+            (time.perf_counter() - start) / (count / batch_size) * 1000
+        )
+        # Unmap the file before the folder is removed, batches are copies
+        del reader
+    return results
+
+
+# Function to measure the mean time of one batched physics step for many players
+def bench_batch_physics(counts=(100, 1_000, 10_000), steps=200, seed=0):
+    rng = np.random.default_rng(seed)
+    grid = OccupancyGrid.from_file("game_data/maps/0.json")
+    results = {}
+    for count in counts:
+        players = BatchPlayers(grid, count)
+        players.reset((20, 20))
+        movements = rng.integers(-1, 2, (steps, count))
+        jumps = rng.random((steps, count)) < 0.05
+        start = time.perf_counter()
+        for step in range(steps):
+            players.update(movements[step])
+            players.jump(jumps[step])
+        results["batch_physics_" + str(count) + "_ms"] = (
+            (time.perf_counter() - start) / steps * 1000
+        )
+    return results
+
+
+# Function to measure end-to-end frames per second of the training loop
+def bench_train(steps=2000, seed=0):
+    seed_everything(seed)
+    model_folder = model.MODEL_FOLDER
+    with tempfile.TemporaryDirectory() as folder:
+        model.MODEL_FOLDER = folder  # Keep the real model untouched
+        try:
+            start = time.perf_counter()
+            train(headless=True, max_steps=steps)
+            frames_per_sec = steps / (time.perf_counter() - start)
+        finally:
+            model.MODEL_FOLDER = model_folder
+    return {"train_frames_per_sec": frames_per_sec}
+
+
+BENCHMARKS = {
+    "play_step": bench_play_step,
+    "render": bench_render,
+    "agent_latency": bench_agent_latency,
+    "inference": bench_inference,
+    "qcache": bench_qcache,
+    "train_step": bench_train_step,
+    "engines": bench_engines,
+    "replay": bench_replay,
+    "trajectory": bench_trajectory,
+    "batch_physics": bench_batch_physics,
+    "train": bench_train,
+}
+
+
+# Function to get the current commit, so results of different commits can be compared
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark training throughput")
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=list(BENCHMARKS),
+        default=list(BENCHMARKS),
+        help="benchmarks to run",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", default="benchmark.json", help="JSON file to write results to"
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only:
+        print("Running", name)
+        results[name] = BENCHMARKS[name](seed=args.seed)
+        for metric, value in results[name].items():
+            print(f"  {metric:<40} {value:12.3f}")
+
+    f = open(args.output, "w")
+    json.dump(
+        {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "seed": args.seed,
+            "results": results,
+        },
+        f,
+        indent=2,
+    )
+    f.close()
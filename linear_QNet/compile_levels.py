@@ -0,0 +1,31 @@
+# Importing built-in modules
+import argparse
+import os
+
+# Imporing other modules
+from scripts.levels import Level
+
+
+# Function to compile every JSON map in a folder into a level bundle
+def compile_levels(folder="game_data/maps", output="game_data/compiled"):
+    os.makedirs(output, exist_ok=True)
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith(".json"):
+            continue
+        level = Level.from_json(None, folder + "/" + name)
+        path = output + "/" + name[: -len(".json")] + ".level"
+        level.save_bundle(path)
+        print("Compiled", folder + "/" + name, "to", path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compile JSON maps into level bundles for fast loading"
+    )
+    parser.add_argument("--maps", default="game_data/maps", help="JSON map folder")
+    parser.add_argument(
+        "--output", default="game_data/compiled", help="folder to write bundles to"
+    )
+    args = parser.parse_args()
+
+    compile_levels(args.maps, args.output)
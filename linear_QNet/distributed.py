@@ -0,0 +1,173 @@
+# Importing built-in modules
+import ctypes
+import multiprocessing
+import random
+import time
+
+# Importing installed modules
+import numpy as np
+import torch
+from torch.nn.utils import parameters_to_vector, vector_to_parameters
+
+# Imporing other modules
+from agent import Agent, MAX_MEMORY, BATCH_SIZE
+from replay import SharedReplayBuffer
+from scripts.timing import timer
+from vec_env import VecGameAI
+
+
+# Class for publishing the learner's weights to the actor processes
+class SharedWeights:
+    def __init__(self, model, ctx=multiprocessing):
+        size = sum(parameter.numel() for parameter in model.parameters())
+        self.raw = ctx.RawArray(ctypes.c_float, size)
+        self.version = ctx.RawValue(ctypes.c_int64, 0)
+        self.lock = ctx.Lock()
+        self.publish(model)
+
+    # Method to copy the model weights into shared memory
+    def publish(self, model):
+        vector = parameters_to_vector(model.parameters()).detach().numpy()
+        with self.lock:
+            np.frombuffer(self.raw, dtype=np.float32)[:] = vector
+            self.version.value += 1
+
+    # Method to load the published weights into a model if they are newer
+    def pull(self, model, version=0):
+        if self.version.value == version:
+            return version
+        with self.lock:
+            vector = np.frombuffer(self.raw, dtype=np.float32).copy()
+            version = self.version.value
+        vector_to_parameters(torch.from_numpy(vector), model.parameters())
+        return version
+
+
+# Function run by each actor process: play games and push transitions
+def run_actor(
+    actor_id,
+    memory,
+    weights,
+    record,
+    stop,
+    num_envs,
+    levels,
+    sync_every,
+    inference,
+    timing,
+):
+    torch.set_num_threads(1)  # Leave the other cores to the other processes
+    random.seed(actor_id)
+    np.random.seed(actor_id)
+    if timing["enabled"]:
+        # Each actor times its own steps, in a file of its own
+        name = "actor " + str(actor_id)
+        path = timing["path"] and timing["path"] + ".actor" + str(actor_id)
+        timer.configure(**{**timing, "path": path, "name": name})
+
+    agent = Agent(memory=memory, inference=inference)
+    version = weights.pull(agent.model)
+    if agent.policy is not None:
+        agent.policy.refresh()  # Pulling replaces the parameters
+    envs = VecGameAI(num_envs, agent.get_state, levels=levels)
+    steps = 0
+    try:
+        while not stop.is_set():
+            states_old = envs.states.copy()
+            final_moves = agent.get_actions(states_old)
+            states_new, rewards, dones, scores = envs.step(final_moves)
+            agent.remember_batch(states_old, final_moves, rewards, states_new, dones)
+            agent.n_games += int(dones.sum())
+
+            with record.get_lock():
+                record.value = max(record.value, int(scores.max()))
+
+            steps += 1
+            if steps % sync_every == 0:
+                version = weights.pull(agent.model, version)
+                if agent.policy is not None:
+                    agent.policy.refresh()
+            timer.step()
+    except KeyboardInterrupt:
+        pass
+
+
+# Function to train with several actor processes feeding a single learner
+def train_distributed(
+    num_actors,
+    envs_per_actor=8,
+    levels=(0,),
+    publish_every=20,
+    sync_every=50,
+    inference="torch",
+    **trainer_options
+):
+    ctx = multiprocessing.get_context("spawn")
+    agent = Agent(memory=SharedReplayBuffer(MAX_MEMORY, 20, ctx=ctx), **trainer_options)
+    weights = SharedWeights(agent.model, ctx=ctx)
+    # Scores are the levels reached, so only passing the starting levels is a record
+    record = ctx.Value(ctypes.c_int, max(levels))
+    stop = ctx.Event()
+    timer.name = "learner"
+    # The actors are new processes, they only get the timing settings
+    timing = {
+        "enabled": timer.enabled,
+        "window": timer.window,
+        "dump_every": timer.dump_every,
+        "path": timer.path,
+    }
+
+    actors = [
+        ctx.Process(
+            target=run_actor,
+            args=(
+                actor_id,
+                agent.memory,
+                weights,
+                record,
+                stop,
+                envs_per_actor,
+                levels,
+                sync_every,
+                inference,
+                timing,
+            ),
+            daemon=True,
+        )
+        for actor_id in range(num_actors)
+    ]
+    for actor in actors:
+        actor.start()
+
+    updates = 0
+    saved_record = record.value
+    loss_list = []
+    try:
+        while True:
+            # Wait for the actors to fill the first batch
+            if len(agent.memory) < BATCH_SIZE:
+                time.sleep(0.1)
+                continue
+
+            loss_list.append(agent.train_long_memory().item())
+            updates += 1
+            if updates % publish_every == 0:
+                weights.publish(agent.model)
+
+            if updates % 100 == 0:
+                print("Updates:", updates, "Transitions:", len(agent.memory))
+                print("Average loss:", sum(loss_list) / len(loss_list))
+                loss_list = []
+
+            if record.value > saved_record:
+                saved_record = record.value
+                agent.model.save()
+                print("Updates", updates, "Record:", saved_record)
+
+            timer.step()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for actor in actors:
+            actor.join()
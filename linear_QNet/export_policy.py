@@ -0,0 +1,99 @@
+# Importing built-in modules
+import argparse
+import os
+import random
+import sys
+
+# Importing installed modules
+import numpy as np
+import torch
+
+# Imporing other modules
+from agent import Agent
+from game import GameAI
+from policy import PRECISIONS, QuantizedPolicy, quantize
+
+
+# Function to record the states seen while the agent plays, exploring as in training
+def record_states(agent, steps, seed=0):
+    random.seed(seed)
+    game = GameAI(headless=True)
+    states = []
+    while len(states) < steps:
+        if game.dead > 1 or game.completed:
+            game.play_step()
+            continue
+        state = agent.get_state(game)
+        states.append(state)
+        game.play_step(action=agent.get_action(state))
+    return np.array(states)
+
+
+# Function to export a trained model as a quantized policy file and check that it
+# picks the same moves as the float model
+def export_policy(model_path, output, precision="int8", states=None, steps=5000):
+    agent = Agent()
+    agent.model.load_state_dict(torch.load(model_path))
+    layers = [
+        (layer.weight.detach().numpy(), layer.bias.detach().numpy())
+        for layer in [*agent.model.hidden_layers, agent.model.output_layer]
+    ]
+    QuantizedPolicy.save(output, quantize(layers, precision))
+    print(
+        "Exported",
+        model_path,
+        "(" + str(os.path.getsize(model_path)) + " bytes) to",
+        output,
+        "(" + str(os.path.getsize(output)) + " bytes)",
+    )
+
+    # Compare the greedy moves of both models on recorded states
+    if states is None:
+        states = record_states(agent, steps)
+    else:
+        states = np.load(states)
+    with torch.inference_mode():
+        expected = agent.model(torch.from_numpy(states.astype(np.float32))).numpy()
+    predicted = QuantizedPolicy.load(output).forward(states)
+    agreement = (expected.argmax(axis=1) == predicted.argmax(axis=1)).mean()
+    print("Matching moves:", f"{agreement:.2%}", "of", len(states), "states")
+    print("Largest Q value error:", np.abs(expected - predicted).max())
+    return agreement
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export a trained model as a quantized policy run with NumPy alone"
+    )
+    parser.add_argument("--model", default="model/model.pth", help="model to export")
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="policy file to write, model/policy_<precision>.npz by default",
+    )
+    parser.add_argument("--precision", choices=list(PRECISIONS), default="int8")
+    parser.add_argument(
+        "--states",
+        default=None,
+        help=".npy file of recorded states to check the moves on",
+    )
+    parser.add_argument(
+        "--steps",
+        type=int,
+        default=5000,
+        help="without --states, number of states to record by playing",
+    )
+    parser.add_argument(
+        "--min-agreement",
+        type=float,
+        default=0.99,
+        help="exit with an error if fewer moves than this fraction match",
+    )
+    args = parser.parse_args()
+
+    output = args.output or "model/policy_" + args.precision + ".npz"
+    agreement = export_policy(
+        args.model, output, args.precision, args.states, args.steps
+    )
+    if agreement < args.min_agreement:
+        sys.exit(1)
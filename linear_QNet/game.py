@@ -5,19 +5,38 @@ import random
 import math
 
 # Importing installed modules
+import numpy as np
 import pygame
 
 # Imporing other modules
 from scripts.utils import load_image, load_images, Animation
 from scripts.entity import Player
-from scripts.tilemap import Tilemap
 from scripts.clouds import Clouds
-from scripts.particle import Particle
-from scripts.spark import Spark
+from scripts.hud import Hud
+from scripts.effects import Transition, Silhouette
+from scripts.particle import ParticleSystem
+from scripts.spark import SparkSystem
+from scripts.levels import LevelRegistry
+from scripts.timing import timer
 
 
 class GameAI:
-    def __init__(self):
+    def __init__(
+        self, headless=False, render_every=0, ticks_per_second=60, effects=True
+    ):
+        # Headless mode skips all drawing and the frame rate cap, optionally
+        # rendering every Nth step for spot-checking a training run
+        self.headless = headless or os.environ.get("SDL_VIDEODRIVER") == "dummy"
+        self.render_every = render_every
+        if self.headless and not self.render_every:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        if self.headless:
+            # Events are not pumped every step, so let Python handle Ctrl+C
+            os.environ.setdefault("SDL_NO_SIGNAL_HANDLERS", "1")
+        self.steps = 0  # Number of simulated steps
+        self.ticks_per_second = ticks_per_second  # Steps per countdown second
+        self.effects = effects  # Leaves, sparks and particles, cosmetic only
+
         pygame.init()
 
         pygame.display.set_caption("rabbithole beta")
@@ -28,6 +47,9 @@ class GameAI:
         self.display_2 = pygame.Surface(
             (320, 240)
         )  # Create a secondary display surface
+        self.scaled = pygame.Surface(
+            self.screen.get_size()
+        )  # Secondary display scaled to the window, reused every frame
 
         self.clock = pygame.time.Clock()
 
@@ -53,9 +75,19 @@ class GameAI:
 
         self.clouds = Clouds(self.assets["clouds"])  # Create clouds object
 
+        self.hud = Hud()  # Overlays, rendered again only when their values change
+        self.hud.add("countdown", (10, 0))
+
+        # Transition frames and silhouette buffers, drawn once and reused every frame
+        self.transition_effect = Transition(self.display.get_size())
+        self.silhouette = Silhouette(self.display.get_size())
+
         self.player = Player(self, (50, 50), (9, 20))  # Create player object
 
-        self.tilemap = Tilemap(self, tile_size=20)  # Create tilemap object
+        self.levels = LevelRegistry(self)  # Levels are parsed once and reused
+
+        self.particles = ParticleSystem(self)  # Leaf and death burst particles
+        self.sparks = SparkSystem()
 
         self.movement = [0, 0, 0]
 
@@ -70,34 +102,26 @@ class GameAI:
         self.spike_warning_right = 0
         self.spike_warning_left = 0
 
-    # Load level from JSON file
+    # Load level, parsing its map file only the first time
     def load_level(self, map_id):
-        self.tilemap.load("game_data/maps/" + str(map_id) + ".json")
+        level = self.levels.get(map_id)
+        self.tilemap = level.tilemap
 
         # Set player position to spawner position
-        for spawner in self.tilemap.extract([("spawner", 0)]):
-            self.player.pos = spawner["pos"]
+        if level.spawn is not None:
+            self.player.pos = list(level.spawn)
             self.player.air_time = 0
 
-        # Extract leaf spawner positions
-        self.leaf_spawner = []
-        for tree in self.tilemap.extract([("decor", 0)], keep=True):
-            self.leaf_spawner.append(
-                pygame.Rect(4 + tree["pos"][0], 4 + tree["pos"][1], 23, 13)
-            )
-
-        # Extract spike positions
-        self.spikes = []
-        for spike in self.tilemap.extract([("obstacle", 0)], keep=True):
-            self.spikes.append(pygame.Rect(spike["pos"][0], spike["pos"][1], 10, 13))
-
-        # Extract escape point position
-        escape = self.tilemap.extract([("escape", 0)], keep=True)[0]
-        self.escape_point = pygame.Rect(escape["pos"][0], escape["pos"][1], 14, 12)
+        # Leaf spawner, spike and escape point rects of the level
+        self.leaf_spawner = level.leaf_spawner
+        self.leaf_rects = level.leaf_rects
+        self.spikes = level.spikes
+        self.spike_grid = level.spike_grid
+        self.escape_point = level.escape_point
 
-        # Initialize lists for particles and sparks
-        self.particles = []
-        self.sparks = []
+        # Remove the particles and sparks of the last episode
+        self.particles.clear()
+        self.sparks.clear()
 
         # Scrolling, death handling parameters
         self.scroll = [0, 0]
@@ -105,255 +129,273 @@ class GameAI:
         self.transition = -30
         self.completed = False
 
-        # Parameters for timer
+        # Parameters for timer, counted in simulation steps
         self.countdown = 20
-        self.last_count = pygame.time.get_ticks()
+        self.last_count = self.steps
+
+    # Skip the death or level completion animation and start the next episode
+    def reset(self):
+        if self.completed:
+            self.level = min(self.level + 1, len(self.levels) - 1)
+        self.load_level(self.level)
 
     def play_step(self, action=[0, 0, 0]):
-        self.distance = math.sqrt(
-            (self.player.pos[0] - self.escape_point.left) ** 2
-            + (self.player.pos[1] - self.escape_point.top) ** 2
+        # Decide whether this step is drawn to the screen
+        self.steps += 1
+        render = not self.headless or (
+            self.render_every and self.steps % self.render_every == 0
         )
-        for y in range(0, 61, 20):
-            self.no_tile_right = self.tilemap.solid_check(
-                [
-                    self.player.pos[0] + self.player.size[0] // 2 + 20,
-                    self.player.pos[1] + self.player.size[1] + y,
-                ]
-            )
-            if self.no_tile_right:
-                break
-
-        for y in range(0, 61, 20):
-            self.no_tile_left = self.tilemap.solid_check(
-                [
-                    self.player.pos[0] + self.player.size[0] // 2 - 20,
-                    self.player.pos[1] + self.player.size[1] + y,
-                ]
+
+        # The player only moves in the physics phase, so one rect serves until then
+        player_rect = self.player.rect()
+
+        with timer.phase("play_step/sensors"):
+            self.distance = math.sqrt(
+                (self.player.pos[0] - self.escape_point.left) ** 2
+                + (self.player.pos[1] - self.escape_point.top) ** 2
             )
-            if self.no_tile_left:
-                break
+            for y in range(0, 61, 20):
+                self.no_tile_right = self.tilemap.solid_check(
+                    [
+                        self.player.pos[0] + self.player.size[0] // 2 + 20,
+                        self.player.pos[1] + self.player.size[1] + y,
+                    ]
+                )
+                if self.no_tile_right:
+                    break
+
+            for y in range(0, 61, 20):
+                self.no_tile_left = self.tilemap.solid_check(
+                    [
+                        self.player.pos[0] + self.player.size[0] // 2 - 20,
+                        self.player.pos[1] + self.player.size[1] + y,
+                    ]
+                )
+                if self.no_tile_left:
+                    break
 
-        self.spike_warning_right = [
-            spike_rect
-            for spike_rect in self.spikes
-            if self.player.rect().move(20, 0).colliderect(spike_rect)
-        ]
+            self.spike_warning_right = self.spike_grid.colliding(
+                player_rect.move(20, 0)
+            )
 
-        self.spike_warning_left = [
-            spike_rect
-            for spike_rect in self.spikes
-            if self.player.rect().move(-20, 0).colliderect(spike_rect)
-        ]
+            self.spike_warning_left = self.spike_grid.colliding(
+                player_rect.move(-20, 0)
+            )
 
         self.movement = action
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-
-        # Clear display surfaces
-        self.display.fill((0, 0, 0, 0))
-        self.display_2.blit(self.assets["background"], (0, 0))
+        with timer.phase("play_step/events"):
+            if render:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        pygame.quit()
+                        sys.exit()
 
         # Screenshake update
         self.screenshake = max(0, self.screenshake - 1)
 
         # Calculate scrolling
         self.scroll[0] += (
-            self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]
+            player_rect.centerx - self.display.get_width() / 2 - self.scroll[0]
         ) / 30
 
         self.scroll[1] += (
-            self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]
+            player_rect.centery - self.display.get_height() / 2 - self.scroll[1]
         ) / 30
 
         render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
 
-        # Generate leaf particles
-        for rect in self.leaf_spawner:
-            if random.random() * 35555 < rect.width * rect.height:
-                pos = (
-                    rect.x + random.random() * rect.width,
-                    rect.y + random.random() * rect.height,
+        with timer.phase("play_step/spikes"):
+            # Spike collision handling
+            spikes_collisions = self.spike_grid.colliding(player_rect)
+            if spikes_collisions and not self.dead:
+                self.dead = 1
+                self.screenshake = max(16, self.screenshake)
+                if render and self.effects:
+                    angles = np.random.random(10) * math.pi * 2
+                    speeds = np.random.random(10) * 5
+                    self.sparks.emit(
+                        player_rect.center, angles, 2 + np.random.random(10)
+                    )
+                    self.particles.emit(
+                        "particle",
+                        np.tile(player_rect.center, (10, 1)),
+                        velocity=np.stack(
+                            [
+                                np.cos(angles + math.pi) * speeds * 0.5,
+                                np.sin(angles + math.pi) * speeds * 0.5,
+                            ],
+                            axis=1,
+                        ),
+                        frame=np.random.randint(0, 8, 10),
+                    )
+
+        with timer.phase("play_step/physics"):
+            # Update player
+            player_visible = not self.dead and not self.completed
+            if player_visible:
+                self.player.update(
+                    self.tilemap, (self.movement[1] - self.movement[0], 0)
                 )
-                self.particles.append(
-                    Particle(
-                        self,
+                self.player.jump() if self.movement[2] else None
+
+        with timer.phase("play_step/reward"):
+            reward = 0
+
+            if (
+                action[2]
+                and self.player.collisions["down"]
+                and self.no_tile_right
+                and self.player.air_time < 1
+            ):
+                reward += 10
+            elif not self.no_tile_right and self.player.collisions["down"]:
+                reward -= 5
+            elif not self.no_tile_left and self.player.collisions["down"]:
+                reward -= 5
+            elif action[2]:
+                reward -= 1
+
+            if (
+                self.spike_warning_right
+                and action[2]
+                and action[1] - action[0] < 0
+                and self.player.collisions["down"]
+            ):
+                reward += 10
+            elif self.spike_warning_left:
+                reward -= 5
+            elif self.spike_warning_right:
+                reward -= 5
+
+            if int(self.distance) == 200:
+                reward += 5
+            elif int(self.distance) == 100:
+                reward += 10
+            elif int(self.distance) == 60:
+                reward += 20
+            elif int(self.distance) == 30:
+                reward += 40
+
+        with timer.phase("play_step/episode"):
+            # Check if player is dead
+            if self.dead:
+                self.dead += 1
+                reward -= 60
+                if self.dead >= 10:
+                    self.transition = min(30, self.transition + 1)
+                if self.dead > 40:
+                    # self.level = max(0, self.level - 1)
+                    self.load_level(self.level)
+
+            # Check if player collides with escape point
+            if self.player.rect().colliderect(self.escape_point):
+                self.transition += 1
+                if self.transition == 2:
+                    self.completed = True
+                    reward += 60
+                if self.transition > 30:
+                    self.level = min(self.level + 1, len(self.levels) - 1)
+                    self.load_level(self.level)
+            if self.transition < 0:
+                self.transition += 1
+
+            # Update countdown timer
+            if self.steps - self.last_count >= self.ticks_per_second:
+                if self.countdown:
+                    self.countdown -= 1
+                else:
+                    reward -= 60
+                    self.dead = 10
+                self.last_count = self.steps
+
+        with timer.phase("play_step/render"):
+            if render:
+                self.render(render_scroll, player_visible)
+
+        return reward, self.level, self.dead > 0
+
+    # Draw the current frame to the window
+    def render(self, render_scroll, player_visible=True):
+        with timer.phase("render/clear"):
+            # Clear display surfaces
+            self.display.fill((0, 0, 0, 0))
+            self.display_2.blit(self.assets["background"], (0, 0))
+
+        with timer.phase("render/leaves"):
+            # Generate leaf particles, each tree rolling once per frame
+            if self.effects and len(self.leaf_rects):
+                rects = self.leaf_rects
+                spawn = np.random.random(len(rects)) * 35555 < rects[:, 2] * rects[:, 3]
+                count = int(spawn.sum())
+                if count:
+                    self.particles.emit(
                         "leaf",
-                        pos,
+                        rects[spawn, :2]
+                        + np.random.random((count, 2)) * rects[spawn, 2:],
                         velocity=[-0.3, 0.4],
-                        frame=random.randint(0, 20),
+                        frame=np.random.randint(0, 21, count),
                     )
-                )
 
-        # Clouds rendering
-        self.clouds.update()
-        self.clouds.render(self.display_2, offset=render_scroll)
-
-        # Tilemap rendering
-        self.tilemap.render(self.display, offset=render_scroll)
-
-        # Spike collision handling
-        spikes_collisions = [
-            spike_rect
-            for spike_rect in self.spikes
-            if self.player.rect().colliderect(spike_rect)
-        ]
-        if spikes_collisions and not self.dead:
-            self.dead = 1
-            self.screenshake = max(16, self.screenshake)
-            for i in range(10):
-                angle = random.random() * math.pi * 2
-                speed = random.random() * 5
-                self.sparks.append(
-                    Spark(
-                        self.player.rect().center,
-                        angle,
-                        2 + random.random(),
-                    )
-                )
-                self.particles.append(
-                    Particle(
-                        self,
-                        "particle",
-                        self.player.rect().center,
-                        velocity=[
-                            math.cos(angle + math.pi) * speed * 0.5,
-                            math.sin(angle + math.pi) * speed * 0.5,
-                        ],
-                        frame=random.randint(0, 7),
-                    )
+        with timer.phase("render/clouds"):
+            # Clouds rendering
+            self.clouds.update()
+            self.clouds.render(self.display_2, offset=render_scroll)
+
+        with timer.phase("render/tilemap"):
+            # Tilemap rendering
+            self.tilemap.render(self.display, offset=render_scroll)
+
+        with timer.phase("render/player"):
+            # Player rendering
+            if player_visible:
+                self.player.render(self.display, offset=render_scroll)
+
+        with timer.phase("render/silhouette"):
+            # Create display silhouette
+            self.silhouette.render(self.display, self.display_2)
+
+        with timer.phase("render/sparks"):
+            # Update and render sparks
+            if self.effects:
+                kill = self.sparks.update()
+                self.sparks.render(self.display, offset=render_scroll)
+                self.sparks.remove(kill)
+
+        with timer.phase("render/particles"):
+            # Update and render particles, leaves swaying as they fall
+            if self.effects:
+                kill = self.particles.update()
+                self.particles.render(self.display, offset=render_scroll)
+                n = self.particles.count
+                leaves = self.particles.type[:n] == self.particles.types.index("leaf")
+                self.particles.pos[:n, 0] += np.where(
+                    leaves, np.sin(self.particles.frame[:n] * 0.035) * 0.3, 0
                 )
-
-        # Update player
-        if not self.dead and not self.completed:
-            self.player.update(self.tilemap, (self.movement[1] - self.movement[0], 0))
-            self.player.render(self.display, offset=render_scroll)
-            self.player.jump() if self.movement[2] else None
-
-        reward = 0
-
-        if (
-            action[2]
-            and self.player.collisions["down"]
-            and self.no_tile_right
-            and self.player.air_time < 1
-        ):
-            reward += 10
-        elif not self.no_tile_right and self.player.collisions["down"]:
-            reward -= 5
-        elif not self.no_tile_left and self.player.collisions["down"]:
-            reward -= 5
-        elif action[2]:
-            reward -= 1
-
-        if (
-            self.spike_warning_right
-            and action[2]
-            and action[1] - action[0] < 0
-            and self.player.collisions["down"]
-        ):
-            reward += 10
-        elif self.spike_warning_left:
-            reward -= 5
-        elif self.spike_warning_right:
-            reward -= 5
-
-        if int(self.distance) == 200:
-            reward += 5
-        elif int(self.distance) == 100:
-            reward += 10
-        elif int(self.distance) == 60:
-            reward += 20
-        elif int(self.distance) == 30:
-            reward += 40
-
-        # Check if player is dead
-        if self.dead:
-            self.dead += 1
-            reward -= 60
-            if self.dead >= 10:
-                self.transition = min(30, self.transition + 1)
-            if self.dead > 40:
-                # self.level = max(0, self.level - 1)
-                self.load_level(self.level)
-
-        # Check if player collides with escape point
-        if self.player.rect().colliderect(self.escape_point):
-            self.transition += 1
-            if self.transition == 2:
-                self.completed = True
-                reward += 60
-            if self.transition > 30:
-                self.level = min(self.level + 1, len(os.listdir("game_data/maps")) - 1)
-                self.load_level(self.level)
-        if self.transition < 0:
-            self.transition += 1
-
-        # Create display silhouette
-        display_mask = pygame.mask.from_surface(self.display)
-        display_sillhouette = display_mask.to_surface(
-            setcolor=(0, 0, 0, 180), unsetcolor=(0, 0, 0, 0)
-        )
-        for offset in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            self.display_2.blit(display_sillhouette, offset)
-
-        # Update and render sparks
-        for spark in self.sparks.copy():
-            kill = spark.update()
-            spark.render(self.display, offset=render_scroll)
-            if kill:
-                self.sparks.remove(spark)
-
-        # Update and render particles
-        for particle in self.particles.copy():
-            kill = particle.update()
-            particle.render(self.display, offset=render_scroll)
-            if particle.type == "leaf":
-                particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3
-            if kill:
-                self.particles.remove(particle)
+                self.particles.remove(kill)
 
         # Blit display onto secondary display
         self.display_2.blit(self.display, (0, 0))
 
-        # Display countdown timer
-        font = pygame.font.SysFont("Times New Roman", 30)
-        img = font.render(str(self.countdown), True, (120, 120, 120))
-        self.display_2.blit(img, (10, 0))
-        count_timer = pygame.time.get_ticks()
-        if count_timer - self.last_count > 1000:
-            if self.countdown:
-                self.countdown -= 1
-            else:
-                reward -= 60
-                self.dead = 10
-            self.last_count = count_timer
-
-        # Display transition effect
-        if self.transition:
-            transition_surf = pygame.Surface(self.display.get_size())
-            pygame.draw.circle(
-                transition_surf,
-                (255, 255, 255),
-                (self.display.get_width() // 2, self.display.get_height() // 2),
-                (30 - abs(self.transition)) * 8,
-            )
-            transition_surf.set_colorkey((255, 255, 255))
-            self.display_2.blit(transition_surf, (0, 0))
+        with timer.phase("render/hud"):
+            # Display countdown timer
+            self.hud.set("countdown", self.countdown)
+            self.hud.render(self.display_2)
 
-        # Apply screenshake effect
-        screenshake_offset = (
-            random.random() * self.screenshake - self.screenshake / 2,
-            random.random() * self.screenshake - self.screenshake / 2,
-        )
-        self.screen.blit(
-            pygame.transform.scale(self.display_2, self.screen.get_size()),
-            screenshake_offset,
-        )
-        pygame.display.update()
-
-        self.clock.tick(60)
+        with timer.phase("render/transition"):
+            # Display transition effect
+            self.transition_effect.render(self.display_2, self.transition)
 
-        return reward, self.level, self.dead > 0
+        with timer.phase("render/scale"):
+            # Apply screenshake effect
+            screenshake_offset = (
+                random.random() * self.screenshake - self.screenshake / 2,
+                random.random() * self.screenshake - self.screenshake / 2,
+            )
+            pygame.transform.scale(self.display_2, self.screen.get_size(), self.scaled)
+            self.screen.blit(self.scaled, screenshake_offset)
+            pygame.display.update()
+
+        with timer.phase("render/clock"):
+            # Headless runs are not capped at 60 FPS
+            if not self.headless:
+                self.clock.tick(60)
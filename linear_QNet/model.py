@@ -1,4 +1,5 @@
 # Importing built-in modules
+import copy
 import os
 
 # Importing installed modules
@@ -11,6 +12,9 @@ import torch.nn.functional as F
 # Imporing other modules
 
 
+MODEL_FOLDER = "./model"
+
+
 class Linear_QNet(nn.Module):
     def __init__(self, input_size, hidden_sizes, output_size):
         super().__init__()
@@ -26,7 +30,7 @@ class Linear_QNet(nn.Module):
         return x
 
     def save(self, file_name="model.pth"):
-        model_folder_path = "./model"
+        model_folder_path = MODEL_FOLDER
         if not os.path.exists(model_folder_path):
             os.makedirs(model_folder_path)
 
@@ -34,13 +38,71 @@ class Linear_QNet(nn.Module):
         torch.save(self.state_dict(), file_name)
 
 
+# Class for running the forward pass of a Linear_QNet with NumPy alone, which for
+# single states is much cheaper than the torch dispatcher
+class NumpyQNet:
+    def __init__(self, model):
+        self.model = model
+        self.refresh()
+
+    # Method to take the weights of the model again, needed only if its parameters
+    # are replaced rather than updated in place
+    def refresh(self):
+        # The arrays share memory with the parameters, so the in-place updates of
+        # the optimizer and load_state_dict show up here without copying
+        self.layers = [
+            (layer.weight.detach().numpy().T, layer.bias.detach().numpy())
+            for layer in [*self.model.hidden_layers, self.model.output_layer]
+        ]
+
+    # Method to get the Q values of a state or a batch of states
+    def forward(self, x):
+        x = numpy.asarray(x, dtype=numpy.float32)
+        for weight, bias in self.layers[:-1]:
+            x = x @ weight
+            x += bias
+            numpy.maximum(x, 0, out=x)
+        weight, bias = self.layers[-1]
+        return x @ weight + bias
+
+
 class QTrainer:
-    def __init__(self, model, lr, gamma):
+    def __init__(self, model, lr, gamma, target_sync=0, tau=None, double=False):
         self.lr = lr
         self.gamma = gamma
         self.model = model
         self.optimizer = optim.Adam(model.parameters(), lr=self.lr)
         self.criterion = nn.MSELoss()
+        self.td_errors = None  # TD errors of the last trained batch
+
+        # Optional frozen target network, synced every target_sync updates
+        self.target_sync = target_sync
+        self.tau = tau  # Polyak averaging factor, hard copy when None
+        self.double = double  # Double DQN: online network picks the next action
+        self.updates = 0
+        self.target_model = None
+        if self.target_sync:
+            self.target_model = copy.deepcopy(model)
+            self.target_model.requires_grad_(False)
+
+    # Method to move the target network towards the online network
+    def sync_target(self):
+        if self.tau is None:
+            self.target_model.load_state_dict(self.model.state_dict())
+        else:
+            with torch.no_grad():
+                for target, online in zip(
+                    self.target_model.parameters(), self.model.parameters()
+                ):
+                    target.lerp_(online, self.tau)
+
+    # Method to get the bootstrapped value of the next states
+    def next_q_values(self, next_state):
+        target_model = self.model if self.target_model is None else self.target_model
+        if self.double:
+            next_action = torch.argmax(self.model(next_state), dim=1, keepdim=True)
+            return target_model(next_state).gather(1, next_action)[:, 0]
+        return target_model(next_state).max(dim=1).values
 
     def train_step(self, state, action, reward, next_state, done):
         state = torch.tensor(numpy.array(state), dtype=torch.float)
@@ -55,23 +117,42 @@ class QTrainer:
             reward = torch.unsqueeze(reward, 0)
             done = (done,)
 
+        done = torch.tensor(numpy.array(done), dtype=torch.bool)
+
+        return self.train_batch(
+            state, torch.argmax(action, dim=1), reward, next_state, done
+        )
+
+    # Method to train on a batch of tensors with actions given as indices,
+    # optionally weighting each sample (e.g. importance sampling weights)
+    def train_batch(self, state, action, reward, next_state, done, weights=None):
         # 1: predicted Q values with current state
         pred = self.model(state)
 
-        target = pred.clone()
-        for idx in range(len(done)):
-            Q_new = reward[idx]
-            if not done[idx]:
-                Q_new = reward[idx] + self.gamma * torch.max(
-                    self.model(next_state[idx])
-                )
+        # 2: Q_new = r + y * max(next_predicted Q value), for all samples at once
+        with torch.no_grad():
+            next_q = self.next_q_values(next_state)
+        Q_new = reward + self.gamma * next_q * ~done
 
-            target[idx][torch.argmax(action[idx]).item()] = Q_new
+        # Only the Q value of the taken action is moved towards Q_new
+        target = pred.detach().clone()
+        target.scatter_(1, action.unsqueeze(1), Q_new.unsqueeze(1))
+
+        # TD errors of the taken actions, e.g. for updating replay priorities
+        self.td_errors = (
+            Q_new - pred.detach().gather(1, action.unsqueeze(1))[:, 0]
+        ).numpy()
 
-        # 2: Q_new = r + y * max(next_predicted Q value)
         self.optimizer.zero_grad()
-        loss = self.criterion(target, pred)
+        if weights is None:
+            loss = self.criterion(target, pred)
+        else:
+            loss = (weights * ((target - pred) ** 2).mean(dim=1)).mean()
         loss.backward()
 
         self.optimizer.step()
+
+        self.updates += 1
+        if self.target_sync and self.updates % self.target_sync == 0:
+            self.sync_target()
         return loss
@@ -0,0 +1,72 @@
+# Importing installed modules
+import numpy as np
+
+# Imporing other modules
+from game import GameAI
+from scripts.physics import OccupancyGrid, BatchPlayers
+
+
+# Function to compare BatchPlayers with Player.update step by step on every map
+def check_batch_physics(players=32, steps=600, seed=0):
+    rng = np.random.default_rng(seed)
+    game = GameAI(headless=True)
+    mismatches = 0
+    for level in range(len(game.levels)):
+        game.load_level(level)
+        spawn = list(game.player.pos)
+        grid = OccupancyGrid.from_tilemap(game.tilemap.tilemap, game.tilemap.tile_size)
+        batch = BatchPlayers(grid, players, size=game.player.size)
+        batch.reset(spawn)
+
+        # Random walks with random jumps, one sequence per player
+        movements = rng.integers(-1, 2, (steps, players))
+        jumps = rng.random((steps, players)) < 0.05
+
+        # Step all players at once, recording their states after every step
+        history = []
+        for step in range(steps):
+            batch.update(movements[step])
+            batch.jump(jumps[step])
+            history.append(
+                (
+                    batch.pos.copy(),
+                    batch.velocity.copy(),
+                    batch.air_time.copy(),
+                    batch.jumps.copy(),
+                    batch.collisions.copy(),
+                )
+            )
+
+        # Replay each sequence on the pygame based Player and compare
+        player = game.player
+        for i in range(players):
+            player.pos = list(spawn)
+            player.velocity = [0, 0]
+            player.air_time = 0
+            player.jumps = 1
+            for step in range(steps):
+                player.update(game.tilemap, (movements[step, i], 0))
+                if jumps[step, i]:
+                    player.jump()
+
+                pos, velocity, air_time, jumps_left, collisions = history[step]
+                if (
+                    list(pos[i]) != list(player.pos)
+                    or list(velocity[i]) != list(player.velocity)
+                    or air_time[i] != player.air_time
+                    or jumps_left[i] != player.jumps
+                    or list(collisions[i])
+                    != [
+                        player.collisions[key]
+                        for key in ["up", "down", "right", "left"]
+                    ]
+                ):
+                    mismatches += 1
+                    print("Level", level, "player", i, "diverged at step", step)
+                    break
+        print("Level", level, "checked", players, "players for", steps, "steps")
+    return mismatches
+
+
+if __name__ == "__main__":
+    print("Mismatching players:", check_batch_physics())
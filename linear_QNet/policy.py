@@ -0,0 +1,72 @@
+# Importing installed modules
+import numpy as np
+
+# Numbers of bytes per weight of each export precision
+PRECISIONS = {"int8": 1, "float16": 2, "float32": 4}
+
+
+# Function to quantize the (weight, bias) float arrays of each layer, weights
+# shaped (outputs, inputs) as in torch. int8 weights get one scale per output
+def quantize(layers, precision="int8"):
+    arrays = {}
+    for i, (weight, bias) in enumerate(layers):
+        if precision == "int8":
+            scale = np.abs(weight).max(axis=1) / 127
+            scale[scale == 0] = 1  # Rows of zeros stay zero
+            arrays["weight_" + str(i)] = np.round(weight / scale[:, None]).astype(
+                np.int8
+            )
+            arrays["scale_" + str(i)] = scale.astype(np.float32)
+        else:
+            arrays["weight_" + str(i)] = weight.astype(precision)
+        arrays["bias_" + str(i)] = bias.astype(np.float32)
+    return arrays
+
+
+# Class for a quantized policy exported by export_policy.py, run with NumPy alone
+class QuantizedPolicy:
+    def __init__(self, arrays):
+        # Weights are expanded back to float32 once, so acting is plain matmuls
+        self.layers = []
+        i = 0
+        while "weight_" + str(i) in arrays:
+            weight = arrays["weight_" + str(i)].astype(np.float32)
+            if "scale_" + str(i) in arrays:
+                weight *= arrays["scale_" + str(i)][:, None]
+            self.layers.append(
+                (np.ascontiguousarray(weight.T), arrays["bias_" + str(i)])
+            )
+            i += 1
+
+    # Method to load a policy file
+    @classmethod
+    def load(cls, path):
+        f = np.load(path)
+        arrays = {name: f[name] for name in f.files}
+        f.close()
+        return cls(arrays)
+
+    # Method to write quantized layers to a policy file
+    @staticmethod
+    def save(path, arrays):
+        # Written through a file so that savez keeps the path without adding .npz
+        f = open(path, "wb")
+        np.savez(f, **arrays)
+        f.close()
+
+    # Method to get the Q values of a state or a batch of states
+    def forward(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        for weight, bias in self.layers[:-1]:
+            x = x @ weight
+            x += bias
+            np.maximum(x, 0, out=x)
+        weight, bias = self.layers[-1]
+        return x @ weight + bias
+
+    # Method to get the greedy move of a state as a one-hot list, like Agent.get_action
+    def get_action(self, state):
+        prediction = self.forward(state)
+        final_move = [0] * len(prediction)
+        final_move[int(prediction.argmax())] = 1
+        return final_move
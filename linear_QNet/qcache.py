@@ -0,0 +1,60 @@
+# Importing built-in modules
+from collections import OrderedDict
+
+
+# Class for remembering the Q values of recently seen states, dropped once the
+# network has been updated refresh_every times since they were computed
+class QValueCache:
+    def __init__(self, capacity=65_536, refresh_every=1):
+        self.capacity = capacity
+        self.refresh_every = refresh_every  # 0 keeps entries, for frozen networks
+        self.entries = OrderedDict()  # Q values by packed state, least recent first
+        self.version = 0  # Number of network updates the entries were computed at
+        self.hits = 0
+        self.misses = 0
+        self.clears = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Method to pack a state into a cache key
+    @staticmethod
+    def key(state):
+        return state.tobytes()
+
+    # Method to drop every entry if the network changed too much since they were stored
+    def check_version(self, version):
+        if self.refresh_every and version - self.version >= self.refresh_every:
+            if self.entries:
+                self.entries.clear()
+                self.clears += 1
+            self.version = version
+
+    # Method to get the cached Q values of a state, None if not cached
+    def get(self, key, version):
+        self.check_version(version)
+        q_values = self.entries.get(key)
+        if q_values is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return q_values
+
+    # Method to store the Q values of a state, evicting the least recently used
+    def put(self, key, q_values):
+        self.entries[key] = q_values
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    # Method to get the fraction of lookups answered from the cache
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    # Method to summarize the cache statistics in one line
+    def summary(self):
+        return (
+            f"hit rate {self.hit_rate():.1%} over {self.hits + self.misses} lookups, "
+            f"{len(self.entries)} entries, cleared {self.clears} times"
+        )
@@ -0,0 +1,89 @@
+# Importing installed modules
+import numpy as np
+import pygame
+
+# Imporing other modules
+from game import GameAI
+
+
+# Function to get the pixels of a tilemap rendered at an offset, baked or not
+def render_tilemap(tilemap, size, offset, cached):
+    surf = pygame.Surface(size, pygame.SRCALPHA)
+    tilemap.cached = cached
+    tilemap.render(surf, offset=offset)
+    return pygame.surfarray.array3d(surf), pygame.surfarray.array_alpha(surf)
+
+
+# Function to get the pixels the tile by tile render leaves out on purpose: grid
+# tiles larger than a cell are culled by their top-left cell, so at the top and
+# left edges they only appear once that cell is on screen
+def culled_pixels(tilemap, size, offset):
+    culled = np.zeros(size, dtype=bool)
+    first = (offset[0] // tilemap.tile_size, offset[1] // tilemap.tile_size)
+    for loc, tile in tilemap.grid.items():
+        if loc[0] >= first[0] and loc[1] >= first[1]:
+            continue
+        img = tilemap.game.assets[tile["type"]][tile["variant"]]
+        x = loc[0] * tilemap.tile_size - offset[0]
+        y = loc[1] * tilemap.tile_size - offset[1]
+        culled[
+            max(x, 0) : max(x + img.get_width(), 0),
+            max(y, 0) : max(y + img.get_height(), 0),
+        ] = True
+    return culled
+
+
+# Function to compare the baked chunk render of every map with the tile by tile
+# render, at random offsets and at offsets putting each offgrid tile across the
+# left and top edges of the display
+def check_cached_render(offsets=200, seed=0):
+    rng = np.random.default_rng(seed)
+    game = GameAI(headless=True)
+    size = game.display.get_size()
+    mismatches = 0
+    for level in range(len(game.levels)):
+        game.load_level(level)
+        tilemap = game.tilemap
+        cached = tilemap.cached
+
+        # Random offsets over the tiles, plus offsets cutting each offgrid tile
+        locs = np.array(list(tilemap.grid)).reshape(-1, 2) * tilemap.tile_size
+        low = locs.min(axis=0) - np.array(size) if len(locs) else (0, 0)
+        high = locs.max(axis=0) + tilemap.tile_size if len(locs) else (1, 1)
+        checks = rng.integers(low, high, (offsets, 2)).tolist()
+        for tile in tilemap.offgrid_tiles:
+            corner = np.floor(tile["pos"]).astype(int)
+            for shift in range(1, 4):
+                checks.append((corner + shift).tolist())
+                checks.append((corner + [shift, -shift]).tolist())
+                checks.append((corner + [-shift, shift]).tolist())
+
+        for offset in checks:
+            expected = render_tilemap(tilemap, size, offset, cached=False)
+            baked = render_tilemap(tilemap, size, offset, cached=True)
+            differing = int(
+                (
+                    ((expected[0] != baked[0]).any(axis=2) | (expected[1] != baked[1]))
+                    & ~culled_pixels(tilemap, size, offset)
+                ).sum()
+            )
+            if differing:
+                mismatches += 1
+                print(
+                    "Level", level, "offset", offset, "differs in", differing, "pixels"
+                )
+        tilemap.cached = cached
+        print(
+            "Level",
+            level,
+            "checked",
+            len(checks),
+            "offsets,",
+            len(tilemap.offgrid_tiles),
+            "offgrid tiles",
+        )
+    return mismatches
+
+
+if __name__ == "__main__":
+    print("Mismatching renders:", check_cached_render())
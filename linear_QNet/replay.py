@@ -0,0 +1,248 @@
+# Importing built-in modules
+import ctypes
+import multiprocessing
+
+# Importing installed modules
+import numpy as np
+import torch
+
+
+# Class for storing transitions in preallocated ring buffer arrays
+class ReplayBuffer:
+    def __init__(self, capacity, state_size, seed=None):
+        self.capacity = capacity
+        self.states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int64)  # Action indices
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.bool_)
+
+        self.index = 0  # Slot the next transition is written to
+        self.size = 0  # Number of stored transitions
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.size
+
+    # Method to store a transition, overwriting the oldest one when full
+    def append(self, state, action, reward, next_state, done):
+        self.states[self.index] = state
+        self.actions[self.index] = action
+        self.rewards[self.index] = reward
+        self.next_states[self.index] = next_state
+        self.dones[self.index] = done
+
+        self.index = (self.index + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    # Method to store a batch of transitions at once
+    def extend(self, states, actions, rewards, next_states, dones):
+        indices = (self.index + np.arange(len(states))) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = next_states
+        self.dones[indices] = dones
+
+        self.index = (self.index + len(states)) % self.capacity
+        self.size = min(self.size + len(states), self.capacity)
+        return indices
+
+    # Method to draw random transition indices without replacement
+    def sample_indices(self, batch_size):
+        if self.size <= batch_size:
+            return np.arange(self.size)
+        return self.rng.choice(self.size, batch_size, replace=False)
+
+    # Method to get the transitions at the given indices as torch tensors
+    def batch(self, indices):
+        return (
+            torch.from_numpy(self.states[indices]),
+            torch.from_numpy(self.actions[indices]),
+            torch.from_numpy(self.rewards[indices]),
+            torch.from_numpy(self.next_states[indices]),
+            torch.from_numpy(self.dones[indices]),
+        )
+
+    # Method to sample a random batch of transitions as torch tensors
+    def sample(self, batch_size):
+        return self.batch(self.sample_indices(batch_size))
+
+
+# Class for an array based binary tree where each node holds the sum of its children
+class SumTree:
+    def __init__(self, capacity):
+        self.leaves = 1
+        while self.leaves < capacity:
+            self.leaves *= 2
+        self.depth = self.leaves.bit_length() - 1
+        self.tree = np.zeros(2 * self.leaves)  # Root at 1, leaves from self.leaves
+
+    # Method to get the sum of all priorities
+    def total(self):
+        return self.tree[1]
+
+    # Method to get the priorities stored at the given leaf indices
+    def get(self, indices):
+        return self.tree[self.leaves + indices]
+
+    # Method to set one priority and update its ancestors in O(log n)
+    def update(self, index, priority):
+        node = self.leaves + index
+        self.tree[node] = priority
+        node //= 2
+        while node:
+            self.tree[node] = self.tree[2 * node] + self.tree[2 * node + 1]
+            node //= 2
+
+    # Method to set many priorities and update their ancestors level by level
+    def update_batch(self, indices, priorities):
+        nodes = self.leaves + indices
+        self.tree[nodes] = priorities
+        nodes = np.unique(nodes // 2)
+        while nodes[0]:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            nodes = np.unique(nodes // 2)
+
+    # Method to find the leaves where the given prefix sums fall in O(log n)
+    def find(self, values):
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            go_right = values > self.tree[left]
+            values = values - self.tree[left] * go_right
+            nodes = left + go_right
+        return nodes - self.leaves
+
+
+# Class for replaying transitions in proportion to their TD error
+class PrioritizedReplayBuffer(ReplayBuffer):
+    def __init__(
+        self,
+        capacity,
+        state_size,
+        alpha=0.6,
+        beta=0.4,
+        beta_increment=1e-3,
+        epsilon=1e-2,
+        seed=None,
+    ):
+        super().__init__(capacity, state_size, seed=seed)
+        self.alpha = alpha  # How strongly priorities skew sampling
+        self.beta = beta  # Importance sampling correction, annealed to 1
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon  # Keeps every transition sampleable
+        self.max_priority = 1.0
+        self.tree = SumTree(capacity)
+
+    # Method to store a transition with the highest priority seen so far
+    def append(self, state, action, reward, next_state, done):
+        self.tree.update(self.index, self.max_priority**self.alpha)
+        super().append(state, action, reward, next_state, done)
+
+    # Method to store a batch of transitions with the highest priority seen so far
+    def extend(self, states, actions, rewards, next_states, dones):
+        indices = super().extend(states, actions, rewards, next_states, dones)
+        self.tree.update_batch(
+            indices, np.full(len(indices), self.max_priority**self.alpha)
+        )
+        return indices
+
+    # Method to draw indices by priority, along with their importance sampling weights
+    def sample_indices(self, batch_size):
+        if self.size <= batch_size:
+            return np.arange(self.size), np.ones(self.size, dtype=np.float32)
+
+        # Stratified sampling, one draw from each equal slice of the total priority
+        total = self.tree.total()
+        segment = total / batch_size
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+        indices = np.clip(self.tree.find(np.minimum(values, total)), 0, self.size - 1)
+
+        probabilities = self.tree.get(indices) / total
+        weights = (self.size * probabilities) ** -self.beta
+        weights /= weights.max()
+        self.beta = min(1.0, self.beta + self.beta_increment)
+        return indices, weights.astype(np.float32)
+
+    # Method to sample a batch of transitions, their indices and weights
+    def sample(self, batch_size):
+        indices, weights = self.sample_indices(batch_size)
+        return self.batch(indices) + (indices, torch.from_numpy(weights))
+
+    # Method to set new priorities from the TD errors of sampled transitions
+    def update_priorities(self, indices, td_errors):
+        priorities = np.abs(td_errors) + self.epsilon
+        self.max_priority = max(self.max_priority, priorities.max())
+        self.tree.update_batch(indices, priorities**self.alpha)
+
+
+# Class for a replay buffer in shared memory, appended to by several processes
+class SharedReplayBuffer(ReplayBuffer):
+    FIELDS = [
+        ("states", np.float32, ctypes.c_float, True),
+        ("actions", np.int64, ctypes.c_int64, False),
+        ("rewards", np.float32, ctypes.c_float, False),
+        ("next_states", np.float32, ctypes.c_float, True),
+        ("dones", np.bool_, ctypes.c_bool, False),
+    ]
+
+    def __init__(self, capacity, state_size, ctx=multiprocessing, seed=None):
+        self.capacity = capacity
+        self.state_size = state_size
+        self.raw = {
+            name: ctx.RawArray(c_type, capacity * (state_size if wide else 1))
+            for name, _, c_type, wide in self.FIELDS
+        }
+        self.counters = ctx.RawArray(ctypes.c_int64, 2)  # Write index and size
+        self.lock = ctx.Lock()
+        self.rng = np.random.default_rng(seed)
+        self.attach()
+
+    # Method to view the shared memory blocks as numpy arrays
+    def attach(self):
+        for name, dtype, _, wide in self.FIELDS:
+            array = np.frombuffer(self.raw[name], dtype=dtype)
+            if wide:
+                array = array.reshape(self.capacity, self.state_size)
+            setattr(self, name, array)
+
+    # Only the shared memory handles are sent to other processes
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name, _, _, _ in self.FIELDS:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.attach()
+
+    @property
+    def index(self):
+        return self.counters[0]
+
+    @index.setter
+    def index(self, value):
+        self.counters[0] = value
+
+    @property
+    def size(self):
+        return self.counters[1]
+
+    @size.setter
+    def size(self, value):
+        self.counters[1] = value
+
+    def append(self, state, action, reward, next_state, done):
+        with self.lock:
+            super().append(state, action, reward, next_state, done)
+
+    def extend(self, states, actions, rewards, next_states, dones):
+        with self.lock:
+            return super().extend(states, actions, rewards, next_states, dones)
+
+    # The rows are copied out under the lock, so actors cannot overwrite them midway
+    def batch(self, indices):
+        with self.lock:
+            return super().batch(indices)
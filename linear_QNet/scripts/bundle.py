@@ -0,0 +1,63 @@
+# Importing built-in modules
+import json
+import math
+import struct
+
+# Importing installed modules
+import numpy as np
+
+# Layout: magic, version, header length, JSON header, then the raw arrays,
+# each starting at a multiple of ALIGN bytes
+MAGIC = b"RHLB"
+VERSION = 1
+ALIGN = 64
+PREFIX = struct.Struct("<4sII")
+
+
+# Function to write named arrays and a JSON serializable meta dict to a bundle file
+def write_bundle(path, meta, arrays):
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+
+    header = json.dumps({"meta": meta, "arrays": layout}).encode()
+    start = -(-(PREFIX.size + len(header)) // ALIGN) * ALIGN
+    f = open(path, "wb")
+    f.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+    f.write(header)
+    for name, array in arrays.items():
+        f.seek(start + layout[name]["offset"])
+        f.write(array.tobytes())
+    f.truncate(start + offset)
+    f.close()
+
+
+# Function to memory-map a bundle file, returning its meta dict and read-only arrays
+def read_bundle(path):
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    magic, version, header_size = PREFIX.unpack(bytes(raw[: PREFIX.size]))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(
+            path + " is not a version " + str(VERSION) + " level bundle, recompile it"
+        )
+
+    header = json.loads(bytes(raw[PREFIX.size : PREFIX.size + header_size]))
+    start = -(-(PREFIX.size + header_size) // ALIGN) * ALIGN
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = math.prod(spec["shape"])
+        begin = start + spec["offset"]
+        arrays[name] = (
+            raw[begin : begin + count * dtype.itemsize]
+            .view(dtype)
+            .reshape(spec["shape"])
+        )
+    return header["meta"], arrays
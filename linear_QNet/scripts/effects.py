@@ -0,0 +1,53 @@
+# Importing installed modules
+import numpy as np
+import pygame
+
+
+# Class for the iris transition, with every frame drawn once up front
+class Transition:
+    def __init__(self, size, frames=30):
+        # Frame i covers the display except for a circle of radius (frames - i) * 8
+        self.frames = [None]
+        for i in range(1, frames + 1):
+            surf = pygame.Surface(size)
+            pygame.draw.circle(
+                surf,
+                (255, 255, 255),
+                (size[0] // 2, size[1] // 2),
+                (frames - i) * 8,
+            )
+            surf.set_colorkey((255, 255, 255), pygame.RLEACCEL)
+            self.frames.append(surf)
+
+    # Method to draw the frame for a transition value, counting towards 0 and away from it
+    def render(self, surf, transition):
+        if transition:
+            surf.blit(self.frames[abs(transition)], (0, 0))
+
+
+# Class for the outline drawn behind a transparent surface, reusing its buffers every frame
+class Silhouette:
+    def __init__(self, size, color=(0, 0, 0, 180), threshold=127):
+        self.surf = pygame.Surface(size, pygame.SRCALPHA)
+        self.color = np.uint32(self.surf.map_rgb(color) & 0xFFFFFFFF)  # Packed pixel
+        self.threshold = threshold  # Outlined above this alpha, as in pygame.mask
+        self.alpha = np.empty((size[1], size[0]), dtype=np.uint32)
+        self.mask = np.empty((size[1], size[0]), dtype=bool)
+
+    # Method to fill the silhouette surface from the pixels of a transparent surface
+    def update(self, source):
+        alpha_mask, alpha_shift = source.get_masks()[3], source.get_shifts()[3]
+        pixels = pygame.surfarray.pixels2d(source)  # Locks the source until deleted
+        np.bitwise_and(pixels.T, alpha_mask, out=self.alpha)
+        del pixels
+        np.greater(self.alpha, self.threshold << alpha_shift, out=self.mask)
+
+        pixels = pygame.surfarray.pixels2d(self.surf)
+        np.multiply(self.mask, self.color, out=pixels.T)
+        del pixels
+
+    # Method to draw the silhouette of a transparent surface at each offset
+    def render(self, source, surf, offsets=((-1, 0), (1, 0), (0, -1), (0, 1))):
+        self.update(source)
+        for offset in offsets:
+            surf.blit(self.surf, offset)
@@ -0,0 +1,36 @@
+# Class for finding the hazard rects that collide with a rect without scanning them all
+class HazardGrid:
+    def __init__(self, rects, cell_size=32):
+        self.rects = rects
+        self.cell_size = cell_size
+        self.cells = {}  # Indices into rects by the (x, y) grid cells they overlap
+        for i, rect in enumerate(rects):
+            for cell in self.cells_of(rect):
+                self.cells.setdefault(cell, []).append(i)
+
+    # Method to list the grid cells a rect overlaps
+    def cells_of(self, rect):
+        return [
+            (x, y)
+            for x in range(
+                rect.left // self.cell_size,
+                (rect.right - 1) // self.cell_size + 1,
+            )
+            for y in range(
+                rect.top // self.cell_size,
+                (rect.bottom - 1) // self.cell_size + 1,
+            )
+        ]
+
+    # Method to get the hazards colliding with a rect, in their original order
+    def colliding(self, rect):
+        found = []
+        size = self.cell_size
+        for x in range(rect.left // size, (rect.right - 1) // size + 1):
+            for y in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                for i in self.cells.get((x, y), ()):
+                    if i not in found and rect.colliderect(self.rects[i]):
+                        found.append(i)
+        if len(found) > 1:
+            found.sort()
+        return [self.rects[i] for i in found]
@@ -0,0 +1,116 @@
+# Importing built-in modules
+import os
+
+# Importing installed modules
+import numpy as np
+import pygame
+
+# Imporing other modules
+from scripts.tilemap import Tilemap
+from scripts.hazards import HazardGrid
+
+
+# Class for a level prepared once from its map file, shared by every episode on it
+class Level:
+    def __init__(self, tilemap, spawn, leaf_spawner, spikes, escape_point):
+        # The tilemap keeps its baked chunks, so resets do not bake them again
+        self.tilemap = tilemap
+        self.spawn = spawn  # Copied into the player on every reset, None if unset
+
+        # Leaf spawner, spike and escape point rects, never modified during play
+        self.leaf_spawner = leaf_spawner
+        self.leaf_rects = np.array(
+            [tuple(rect) for rect in leaf_spawner], dtype=np.float64
+        ).reshape(-1, 4)
+        self.spikes = spikes
+        self.spike_grid = HazardGrid(self.spikes)
+        self.escape_point = escape_point
+
+    # Method to prepare a level from a JSON map file
+    @classmethod
+    def from_json(cls, game, path, tile_size=20):
+        tilemap = Tilemap(game, tile_size=tile_size, cached=True)
+        tilemap.load(path)
+
+        spawn = None
+        for spawner in tilemap.extract([("spawner", 0)]):
+            spawn = tuple(spawner["pos"])
+
+        leaf_spawner = []
+        for tree in tilemap.extract([("decor", 0)], keep=True):
+            leaf_spawner.append(
+                pygame.Rect(4 + tree["pos"][0], 4 + tree["pos"][1], 23, 13)
+            )
+
+        spikes = []
+        for spike in tilemap.extract([("obstacle", 0)], keep=True):
+            spikes.append(pygame.Rect(spike["pos"][0], spike["pos"][1], 10, 13))
+
+        escape = tilemap.extract([("escape", 0)], keep=True)[0]
+        escape_point = pygame.Rect(escape["pos"][0], escape["pos"][1], 14, 12)
+        return cls(tilemap, spawn, leaf_spawner, spikes, escape_point)
+
+    # Method to load a level compiled by compile_levels.py
+    @classmethod
+    def from_bundle(cls, game, path):
+        tilemap = Tilemap(game, cached=True)
+        meta, arrays = tilemap.load_bundle(path)
+        return cls(
+            tilemap,
+            None if meta["spawn"] is None else tuple(meta["spawn"]),
+            [pygame.Rect(rect) for rect in arrays["leaf_spawner"].tolist()],
+            [pygame.Rect(rect) for rect in arrays["spikes"].tolist()],
+            pygame.Rect(arrays["escape_point"].tolist()),
+        )
+
+    # Method to write the level, with its derived rects, as a compiled bundle
+    def save_bundle(self, path):
+        self.tilemap.save_bundle(
+            path,
+            {"spawn": None if self.spawn is None else list(self.spawn)},
+            {
+                "leaf_spawner": np.array(
+                    [tuple(rect) for rect in self.leaf_spawner], dtype=np.int32
+                ).reshape(-1, 4),
+                "spikes": np.array(
+                    [tuple(rect) for rect in self.spikes], dtype=np.int32
+                ).reshape(-1, 4),
+                "escape_point": np.array(tuple(self.escape_point), dtype=np.int32),
+            },
+        )
+
+
+# Class for loading each level on first use and keeping it for later resets
+class LevelRegistry:
+    def __init__(
+        self,
+        game,
+        folder="game_data/maps",
+        compiled_folder="game_data/compiled",
+        tile_size=20,
+    ):
+        self.game = game
+        self.folder = folder
+        self.compiled_folder = compiled_folder
+        self.tile_size = tile_size
+        self.count = len(os.listdir(folder))  # Number of levels, counted once
+        self.levels = {}
+
+    def __len__(self):
+        return self.count
+
+    # Method to get the prepared level, loading it the first time
+    def get(self, map_id):
+        if map_id not in self.levels:
+            path = self.folder + "/" + str(map_id) + ".json"
+            compiled_path = self.compiled_folder + "/" + str(map_id) + ".level"
+            # Prefer the compiled bundle unless the map was edited after compiling
+            if os.path.exists(compiled_path) and os.path.getmtime(
+                compiled_path
+            ) >= os.path.getmtime(path):
+                self.levels[map_id] = Level.from_bundle(self.game, compiled_path)
+            else:
+                self.levels[map_id] = Level.from_json(
+                    self.game, path, tile_size=self.tile_size
+                )
+        return self.levels[map_id]
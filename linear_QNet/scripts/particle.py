@@ -1,39 +1,99 @@
-class Particle:
-    def __init__(self, game, p_type, pos, velocity=[0, 0], frame=0):
-        self.game = game
-        self.type = p_type
-        self.pos = list(pos)  # Convert position tuple to a mutable list
-        self.velocity = list(velocity)  # Convert velocity list to a mutable list
-        self.animation = self.game.assets[
-            "particle/" + p_type
-        ].copy()  # Initialize particle animation
-        self.animation.frame = frame  # Set initial animation frame
+# Importing installed modules
+import numpy as np
 
-    def update(self):
-        kill = False  # Flag to determine if the particle should be removed
 
-        # Check if animation is done (particle should be removed)
-        if self.animation.done:
-            kill = True
+# Class for updating and drawing many particles at once from preallocated arrays
+class ParticleSystem:
+    def __init__(self, game, types=("leaf", "particle"), capacity=256):
+        self.types = list(types)
+
+        # Frame table: the images of every type, padded half sizes for centering,
+        # frames per image and last frame of the non-looping animations
+        animations = [game.assets["particle/" + p_type] for p_type in self.types]
+        self.images = [animation.images for animation in animations]
+        self.half_sizes = np.zeros(
+            (len(self.types), max(len(images) for images in self.images), 2),
+            dtype=np.int64,
+        )
+        for i, images in enumerate(self.images):
+            for j, img in enumerate(images):
+                self.half_sizes[i, j] = (img.get_width() // 2, img.get_height() // 2)
+        self.durations = np.array([animation.img_duration for animation in animations])
+        self.last_frames = np.array(
+            [
+                animation.img_duration * len(animation.images) - 1
+                for animation in animations
+            ]
+        )
+
+        self.count = 0  # Live particles are the first count rows of every array
+        self.pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.frame = np.zeros(capacity, dtype=np.int64)
+        self.type = np.zeros(capacity, dtype=np.int64)
+        self.done = np.zeros(capacity, dtype=bool)
+
+    # Method to remove every particle
+    def clear(self):
+        self.count = 0
 
-        # Update particle's position based on velocity
-        self.pos[0] += self.velocity[0]
-        self.pos[1] += self.velocity[1]
+    # Method to add a batch of particles of one type
+    def emit(self, p_type, pos, velocity=(0, 0), frame=0):
+        pos = np.asarray(pos, dtype=np.float64).reshape(-1, 2)
+        start = self.count
+        end = start + len(pos)
+        if end > len(self.pos):
+            # Double the arrays until the new particles fit
+            capacity = len(self.pos)
+            while capacity < end:
+                capacity *= 2
+            for name in ["pos", "velocity", "frame", "type", "done"]:
+                old = getattr(self, name)
+                new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[:start] = old[:start]
+                setattr(self, name, new)
 
-        # Update particle animation
-        self.animation.update()
+        self.pos[start:end] = pos
+        self.velocity[start:end] = velocity
+        self.frame[start:end] = frame
+        self.type[start:end] = self.types.index(p_type)
+        self.done[start:end] = False
+        self.count = end
 
+    # Method to move and animate every particle, returning the ones that finished
+    def update(self):
+        n = self.count
+        kill = self.done[:n].copy()  # Finished on an earlier update
+        self.pos[:n] += self.velocity[:n]
+        last_frames = self.last_frames[self.type[:n]]
+        self.frame[:n] = np.minimum(self.frame[:n] + 1, last_frames)
+        self.done[:n] |= self.frame[:n] >= last_frames
         return kill
 
+    # Method to draw every particle centered on its position with one blits call
     def render(self, surf, offset=(0, 0)):
-        # Get the current image of the particle from its animation
-        img = self.animation.img()
-
-        # Blit the particle's image onto the surface
-        surf.blit(
-            img,
-            (
-                self.pos[0] - offset[0] - img.get_width() // 2,
-                self.pos[1] - offset[1] - img.get_height() // 2,
+        n = self.count
+        types = self.type[:n]
+        indices = self.frame[:n] // self.durations[types]
+        positions = self.pos[:n] - offset - self.half_sizes[types, indices]
+        surf.blits(
+            zip(
+                [
+                    self.images[p_type][index]
+                    for p_type, index in zip(types.tolist(), indices.tolist())
+                ],
+                positions.tolist(),
             ),
+            doreturn=False,
         )
+
+    # Method to drop the particles in the mask, keeping the others in draw order
+    def remove(self, mask):
+        n = self.count
+        keep = ~mask[:n]
+        m = int(keep.sum())
+        if m == n:
+            return
+        for array in [self.pos, self.velocity, self.frame, self.type, self.done]:
+            array[:m] = array[:n][keep]
+        self.count = m
@@ -0,0 +1,160 @@
+# Importing built-in modules
+import json
+
+# Importing installed modules
+import numpy as np
+
+# Neighbour order of Tilemap.tiles_around, which decides the order collisions resolve in
+NEIGHBOR_OFFSETS = [
+    (-1, 0),
+    (-1, -1),
+    (0, -1),
+    (1, -1),
+    (1, 0),
+    (0, 0),
+    (-1, 1),
+    (0, 1),
+    (1, 1),
+]
+PHYSICS_TILES = {"dirt"}
+
+
+# Class for a dense grid telling which tiles are solid
+class OccupancyGrid:
+    def __init__(self, solid, origin, tile_size):
+        self.solid = solid  # Boolean array indexed by [x, y] tile coordinates
+        self.origin = origin  # Tile coordinates of solid[0, 0]
+        self.tile_size = tile_size
+
+    # Method to build the grid from a tilemap dictionary of "x;y" keys
+    @classmethod
+    def from_tilemap(cls, tilemap, tile_size):
+        locs = np.array(
+            [tile["pos"] for tile in tilemap.values() if tile["type"] in PHYSICS_TILES],
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        if not len(locs):
+            return cls(np.zeros((1, 1), dtype=bool), (0, 0), tile_size)
+        origin = locs.min(axis=0)
+        solid = np.zeros(locs.max(axis=0) - origin + 1, dtype=bool)
+        solid[locs[:, 0] - origin[0], locs[:, 1] - origin[1]] = True
+        return cls(solid, (int(origin[0]), int(origin[1])), tile_size)
+
+    # Method to build the grid from a map JSON file
+    @classmethod
+    def from_file(cls, path):
+        f = open(path, "r")
+        map_data = json.load(f)
+        f.close()
+        return cls.from_tilemap(map_data["tilemap"], map_data["tile_size"])
+
+    # Method to check whether the given tile coordinates are solid
+    def is_solid(self, tile_x, tile_y):
+        x = tile_x - self.origin[0]
+        y = tile_y - self.origin[1]
+        inside = (
+            (x >= 0) & (x < self.solid.shape[0]) & (y >= 0) & (y < self.solid.shape[1])
+        )
+        result = np.zeros(np.shape(x), dtype=bool)
+        result[inside] = self.solid[x[inside], y[inside]]
+        return result
+
+
+# Class for simulating many players at once, following PhysicsEntity and Player
+class BatchPlayers:
+    UP, DOWN, RIGHT, LEFT = range(4)  # Columns of the collisions array
+
+    def __init__(self, grid, count, size=(9, 20)):
+        self.grid = grid
+        self.count = count
+        self.size = size
+        self.pos = np.zeros((count, 2))
+        self.velocity = np.zeros((count, 2))
+        self.air_time = np.zeros(count, dtype=np.int64)
+        self.jumps = np.ones(count, dtype=np.int64)
+        self.collisions = np.zeros((count, 4), dtype=bool)
+        self.dead = np.zeros(count, dtype=bool)  # Fell for too long
+
+    # Method to put the chosen players (all by default) back at a spawn point
+    def reset(self, pos, mask=None):
+        mask = np.ones(self.count, dtype=bool) if mask is None else mask
+        self.pos[mask] = pos
+        self.velocity[mask] = 0
+        self.air_time[mask] = 0
+        self.jumps[mask] = 1
+        self.collisions[mask] = False
+        self.dead[mask] = False
+
+    # Method to move every player along one axis and resolve tile collisions
+    def move_axis(self, axis, frame_movement):
+        tile_size = self.grid.tile_size
+        self.pos[:, axis] += frame_movement
+
+        # Integer rect like pygame.Rect, which truncates float coordinates
+        rect_x = np.trunc(self.pos[:, 0]).astype(np.int64)
+        rect_y = np.trunc(self.pos[:, 1]).astype(np.int64)
+        tile_x = np.floor_divide(self.pos[:, 0], tile_size).astype(np.int64)
+        tile_y = np.floor_divide(self.pos[:, 1], tile_size).astype(np.int64)
+        moved = np.zeros(self.count, dtype=bool)
+
+        # Check the neighbouring tiles in the same order as Tilemap.tiles_around
+        for offset in NEIGHBOR_OFFSETS:
+            check_x = tile_x + offset[0]
+            check_y = tile_y + offset[1]
+            left = check_x * tile_size
+            top = check_y * tile_size
+            hit = (
+                self.grid.is_solid(check_x, check_y)
+                & (rect_x < left + tile_size)
+                & (rect_x + self.size[0] > left)
+                & (rect_y < top + tile_size)
+                & (rect_y + self.size[1] > top)
+            )
+            if axis == 0:
+                forward = hit & (frame_movement > 0)
+                backward = hit & (frame_movement < 0)
+                rect_x = np.where(forward, left - self.size[0], rect_x)
+                rect_x = np.where(backward, left + tile_size, rect_x)
+                self.collisions[:, self.RIGHT] |= forward
+                self.collisions[:, self.LEFT] |= backward
+            else:
+                forward = hit & (frame_movement > 0)
+                backward = hit & (frame_movement < 0)
+                rect_y = np.where(forward, top - self.size[1], rect_y)
+                rect_y = np.where(backward, top + tile_size, rect_y)
+                self.collisions[:, self.DOWN] |= forward
+                self.collisions[:, self.UP] |= backward
+            moved |= hit
+
+        # Snap colliding players to their resolved rect position
+        rect = rect_x if axis == 0 else rect_y
+        self.pos[:, axis] = np.where(moved, rect, self.pos[:, axis])
+
+    # Method to advance every player by one frame, like Player.update
+    def update(self, movement):
+        self.collisions[:] = False
+
+        # Horizontal then vertical movement collision detection and resolution
+        self.move_axis(0, movement + self.velocity[:, 0])
+        self.move_axis(1, self.velocity[:, 1])
+
+        # Apply gravity and check for collisions with ground
+        self.velocity[:, 1] = np.minimum(5, self.velocity[:, 1] + 0.1)
+        grounded = self.collisions[:, self.DOWN] | self.collisions[:, self.UP]
+        self.velocity[grounded, 1] = 0
+
+        # Check for falling off the screen
+        self.dead |= self.air_time > 120
+
+        # Increment air time and reset jumps on landing
+        self.air_time += 1
+        landed = self.collisions[:, self.DOWN]
+        self.air_time[landed] = 0
+        self.jumps[landed] = 1
+
+    # Method to make the chosen players jump, like Player.jump
+    def jump(self, mask):
+        mask = mask & (self.jumps > 0)
+        self.velocity[mask, 1] = -3
+        self.jumps[mask] -= 1
+        self.air_time[mask] = 5
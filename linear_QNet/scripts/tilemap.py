@@ -2,8 +2,12 @@
 import json
 
 # Importing installed modules
+import numpy as np
 import pygame
 
+# Imporing other modules
+from scripts.bundle import write_bundle, read_bundle
+
 # Define autotile map and constants
 AUTOTILE_MAP = {
     tuple(sorted([(1, 0), (0, 1), (-1, 0)])): 0,
@@ -30,16 +34,55 @@ NEIGHBOR_OFFSETS = [
 ]
 PHYSICS_TILES = {"dirt"}
 AUTOTILE_TYPES = {"dirt"}
+CHUNK_TILES = 8  # Width and height of a baked chunk, in tiles
 
 
 # Class for managing the tilemap
 class Tilemap:
-    def __init__(self, game, tile_size=16):
+    def __init__(self, game, tile_size=16, cached=False):
         self.game = game
         self.tile_size = tile_size
-        self.tilemap = {}
+        self.cached = cached  # Render from baked chunk surfaces
+        self.chunks = None  # Baked chunk surfaces by chunk coordinates, None if stale
+        self.tilemap = {}  # Tiles by "x;y" key, as saved to disk
+        self.grid = {}  # The same tiles by (x, y) tuple, used for lookups
+        self.physics_rects = {}  # Collision rects of physics tiles by (x, y)
         self.offgrid_tiles = []
 
+    # Method to rebuild the integer keyed lookups from the "x;y" keyed tilemap
+    def index(self):
+        self.chunks = None
+        self.grid = {}
+        self.physics_rects = {}
+        for loc, tile in list(self.tilemap.items()):
+            x, y = loc.split(";")
+            self.set_tile((int(x), int(y)), tile)
+
+    # Method to place a tile at the given tile coordinates
+    def set_tile(self, tile_pos, tile):
+        self.tilemap[str(tile_pos[0]) + ";" + str(tile_pos[1])] = tile
+        self.grid[tuple(tile_pos)] = tile
+        self.chunks = None
+        self.physics_rects.pop(tuple(tile_pos), None)
+        if tile["type"] in PHYSICS_TILES:
+            self.physics_rects[tuple(tile_pos)] = pygame.Rect(
+                tile["pos"][0] * self.tile_size,
+                tile["pos"][1] * self.tile_size,
+                self.tile_size,
+                self.tile_size,
+            )
+
+    # Method to remove the tile at the given tile coordinates, if any
+    def remove_tile(self, tile_pos):
+        self.tilemap.pop(str(tile_pos[0]) + ";" + str(tile_pos[1]), None)
+        self.grid.pop(tuple(tile_pos), None)
+        self.physics_rects.pop(tuple(tile_pos), None)
+        self.chunks = None
+
+    # Method to drop the baked chunks after tiles were changed from outside
+    def invalidate(self):
+        self.chunks = None
+
     # Method to extract specific tiles from the tilemap
     def extract(self, id_pairs, keep=False):
         matches = []
@@ -59,18 +102,19 @@ class Tilemap:
                 matches[-1]["pos"][1] *= self.tile_size
                 if not keep:
                     del self.tilemap[loc]
+        if not keep:
+            self.index()
         return matches
 
     # Method to get tiles around a given position
     def tiles_around(self, pos):
         tiles = []
-        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        tile_x = int(pos[0] // self.tile_size)
+        tile_y = int(pos[1] // self.tile_size)
         for offset in NEIGHBOR_OFFSETS:
-            check_loc = (
-                str(tile_loc[0] + offset[0]) + ";" + str(tile_loc[1] + offset[1])
-            )
-            if check_loc in self.tilemap:
-                tiles.append(self.tilemap[check_loc])
+            tile = self.grid.get((tile_x + offset[0], tile_y + offset[1]))
+            if tile is not None:
+                tiles.append(tile)
         return tiles
 
     # Method to save the tilemap to a file
@@ -94,53 +138,150 @@ class Tilemap:
         self.tilemap = map_data["tilemap"]
         self.tile_size = map_data["tile_size"]
         self.offgrid_tiles = map_data["offgrid"]
+        self.index()
+
+    # Method to save the tilemap as a compiled bundle, along with extra data
+    def save_bundle(self, path, meta=None, arrays=None):
+        types = sorted(
+            {tile["type"] for tile in self.tilemap.values()}
+            | {tile["type"] for tile in self.offgrid_tiles}
+        )
+        type_ids = {name: i for i, name in enumerate(types)}
+
+        # Dense grid of type ids (-1 for no tile) and variants
+        locs = np.array(list(self.grid), dtype=np.int64).reshape(-1, 2)
+        origin = locs.min(axis=0) if len(locs) else np.zeros(2, dtype=np.int64)
+        shape = locs.max(axis=0) - origin + 1 if len(locs) else (0, 0)
+        grid_type = np.full(shape, -1, dtype=np.int8)
+        grid_variant = np.zeros(shape, dtype=np.uint8)
+        for loc, tile in self.grid.items():
+            grid_type[loc[0] - origin[0], loc[1] - origin[1]] = type_ids[tile["type"]]
+            grid_variant[loc[0] - origin[0], loc[1] - origin[1]] = tile["variant"]
+
+        write_bundle(
+            path,
+            {
+                **(meta or {}),
+                "tile_size": self.tile_size,
+                "types": types,
+                "origin": [int(origin[0]), int(origin[1])],
+            },
+            {
+                **(arrays or {}),
+                "grid_type": grid_type,
+                "grid_variant": grid_variant,
+                "offgrid_pos": np.array(
+                    [tile["pos"] for tile in self.offgrid_tiles], dtype=np.float64
+                ).reshape(-1, 2),
+                "offgrid_type": np.array(
+                    [type_ids[tile["type"]] for tile in self.offgrid_tiles],
+                    dtype=np.int8,
+                ),
+                "offgrid_variant": np.array(
+                    [tile["variant"] for tile in self.offgrid_tiles], dtype=np.uint8
+                ),
+            },
+        )
+
+    # Method to load the tilemap from a memory-mapped bundle, returning its data
+    def load_bundle(self, path):
+        meta, arrays = read_bundle(path)
+        types = meta["types"]
+        origin = meta["origin"]
+
+        self.tile_size = meta["tile_size"]
+        self.tilemap = {}
+        self.grid = {}
+        self.physics_rects = {}
+        self.chunks = None
+        locs = np.argwhere(arrays["grid_type"] >= 0)
+        for (x, y), tile_type, variant in zip(
+            locs.tolist(),
+            arrays["grid_type"][locs[:, 0], locs[:, 1]].tolist(),
+            arrays["grid_variant"][locs[:, 0], locs[:, 1]].tolist(),
+        ):
+            pos = [x + origin[0], y + origin[1]]
+            self.set_tile(
+                pos, {"type": types[tile_type], "variant": variant, "pos": pos}
+            )
+        self.offgrid_tiles = [
+            {"type": types[tile_type], "variant": variant, "pos": pos}
+            for pos, tile_type, variant in zip(
+                arrays["offgrid_pos"].tolist(),
+                arrays["offgrid_type"].tolist(),
+                arrays["offgrid_variant"].tolist(),
+            )
+        ]
+        return meta, arrays
 
     # Method to check if a position is within a solid tile
     def solid_check(self, pos):
-        tile_loc = (
-            str(int(pos[0] // self.tile_size))
-            + ";"
-            + str(int(pos[1] // self.tile_size))
-        )
-        if tile_loc in self.tilemap:
-            if self.tilemap[tile_loc]["type"] in PHYSICS_TILES:
-                return self.tilemap[tile_loc]
+        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        if tile_loc in self.physics_rects:
+            return self.grid[tile_loc]
 
-    # Method to get collision rectangles around a position
+    # Method to get collision rectangles around a position (shared, not copies)
     def physics_rects_around(self, pos):
         rects = []
-        for tile in self.tiles_around(pos):
-            if tile["type"] in PHYSICS_TILES:
-                rects.append(
-                    pygame.Rect(
-                        tile["pos"][0] * self.tile_size,
-                        tile["pos"][1] * self.tile_size,
-                        self.tile_size,
-                        self.tile_size,
-                    )
-                )
+        tile_x = int(pos[0] // self.tile_size)
+        tile_y = int(pos[1] // self.tile_size)
+        for offset in NEIGHBOR_OFFSETS:
+            rect = self.physics_rects.get((tile_x + offset[0], tile_y + offset[1]))
+            if rect is not None:
+                rects.append(rect)
         return rects
 
     # Method to perform autotiling on the tilemap
     def autotile(self):
+        self.chunks = None
         for loc in self.tilemap:
             tile = self.tilemap[loc]
             neighbors = set()
             # Check neighbors for similar tiles
             for shift in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
-                check_loc = (
-                    str(tile["pos"][0] + shift[0])
-                    + ";"
-                    + str(tile["pos"][1] + shift[1])
+                check_tile = self.grid.get(
+                    (tile["pos"][0] + shift[0], tile["pos"][1] + shift[1])
                 )
-                if check_loc in self.tilemap:
-                    if self.tilemap[check_loc]["type"] == tile["type"]:
-                        neighbors.add(shift)
+                if check_tile is not None and check_tile["type"] == tile["type"]:
+                    neighbors.add(shift)
             neighbors = tuple(sorted(neighbors))
             # Apply autotile variant based on neighbors
             if (tile["type"] in AUTOTILE_TYPES) and (neighbors in AUTOTILE_MAP):
                 tile["variant"] = AUTOTILE_MAP[neighbors]
 
+    # Method to pre-render the grid tiles onto chunk surfaces. Offgrid tiles are
+    # left out, since blit truncates their fractional screen positions towards
+    # zero and where that lands depends on the offset
+    def bake(self):
+        self.chunks = {}
+        chunk_size = CHUNK_TILES * self.tile_size
+        tiles = [
+            (
+                self.grid[loc],
+                (loc[0] * self.tile_size, loc[1] * self.tile_size),
+            )
+            for loc in sorted(self.grid)
+        ]
+        for tile, pos in tiles:
+            img = self.game.assets[tile["type"]][tile["variant"]]
+            # Draw the tile on every chunk it overlaps
+            for x in range(
+                int(pos[0] // chunk_size),
+                int((pos[0] + img.get_width()) // chunk_size) + 1,
+            ):
+                for y in range(
+                    int(pos[1] // chunk_size),
+                    int((pos[1] + img.get_height()) // chunk_size) + 1,
+                ):
+                    if (x, y) not in self.chunks:
+                        self.chunks[(x, y)] = pygame.Surface((chunk_size, chunk_size))
+                    self.chunks[(x, y)].blit(
+                        img, (pos[0] - x * chunk_size, pos[1] - y * chunk_size)
+                    )
+        # Black is transparent, like the colorkey of the tile images
+        for chunk in self.chunks.values():
+            chunk.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+
     # Method to render the tilemap onto a surface
     def render(self, surf, offset=(0, 0)):
         # Render offgrid tiles
@@ -149,6 +290,27 @@ class Tilemap:
                 self.game.assets[tile["type"]][tile["variant"]],
                 (tile["pos"][0] - offset[0], tile["pos"][1] - offset[1]),
             )
+
+        if self.cached:
+            # Blit the visible baked chunks, baking them again if tiles changed
+            if self.chunks is None:
+                self.bake()
+            chunk_size = CHUNK_TILES * self.tile_size
+            for x in range(
+                offset[0] // chunk_size,
+                (offset[0] + surf.get_width()) // chunk_size + 1,
+            ):
+                for y in range(
+                    offset[1] // chunk_size,
+                    (offset[1] + surf.get_height()) // chunk_size + 1,
+                ):
+                    if (x, y) in self.chunks:
+                        surf.blit(
+                            self.chunks[(x, y)],
+                            (x * chunk_size - offset[0], y * chunk_size - offset[1]),
+                        )
+            return
+
         # Render tilemap tiles within the viewable area
         for x in range(
             offset[0] // self.tile_size,
@@ -158,9 +320,8 @@ class Tilemap:
                 offset[1] // self.tile_size,
                 (offset[1] + surf.get_height()) // self.tile_size + 1,
             ):
-                loc = str(x) + ";" + str(y)
-                if loc in self.tilemap:
-                    tile = self.tilemap[loc]
+                tile = self.grid.get((x, y))
+                if tile is not None:
                     surf.blit(
                         self.game.assets[tile["type"]][tile["variant"]],
                         (
@@ -0,0 +1,159 @@
+# Importing built-in modules
+import cProfile
+import json
+import pstats
+import signal
+import time
+
+# Importing installed modules
+import numpy as np
+
+# Upper edges of the histogram buckets, in microseconds
+HISTOGRAM_EDGES_US = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+# Class for a phase that does nothing, returned while timing is disabled
+class NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+# Class for the rolling record of how long one named phase took
+class Phase:
+    def __init__(self, window):
+        self.durations = np.zeros(window)  # Ring buffer of the latest durations
+        self.count = 0
+        self.total = 0.0
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        self.durations[self.count % len(self.durations)] = duration
+        self.count += 1
+        self.total += duration
+        return False
+
+    # Method to summarize the latest durations in microseconds
+    def summary(self):
+        durations = self.durations[: min(self.count, len(self.durations))] * 1e6
+        counts, _ = np.histogram(durations, bins=[0] + HISTOGRAM_EDGES_US + [np.inf])
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_us": float(durations.mean()),
+            "p50_us": float(np.percentile(durations, 50)),
+            "p90_us": float(np.percentile(durations, 90)),
+            "p99_us": float(np.percentile(durations, 99)),
+            "max_us": float(durations.max()),
+            "histogram": counts.tolist(),
+        }
+
+
+# Class for timing named phases of each step, close to free while disabled
+class PhaseTimer:
+    def __init__(self):
+        self.enabled = False
+        self.window = 1000  # Number of latest durations kept per phase
+        self.dump_every = 0  # Steps between dumps, 0 to never dump
+        self.path = None  # File to append JSON lines to, the console when None
+        self.name = None  # Process the timings belong to, when several dump them
+        self.phases = {}
+        self.steps = 0
+
+        self.profiler = None
+        self.profile_left = 0  # Steps left in the current cProfile window
+        self.profile_path = None
+
+    # Method to switch timing on with the given settings
+    def configure(
+        self, enabled=True, window=1000, dump_every=1000, path=None, name=None
+    ):
+        self.enabled = enabled
+        self.window = window
+        self.dump_every = dump_every
+        self.path = path
+        self.name = name
+        self.phases = {}
+
+    # Method to get the context manager timing one named phase
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase(self.window)
+        return phase
+
+    # Method to mark the end of a step, dumping and profiling when due
+    def step(self):
+        self.steps += 1
+        if self.profile_left:
+            self.profile_left -= 1
+            if not self.profile_left:
+                self.stop_profile()
+        if self.enabled and self.dump_every and self.steps % self.dump_every == 0:
+            self.dump()
+
+    # Method to summarize every phase seen so far
+    def summary(self):
+        return {name: phase.summary() for name, phase in sorted(self.phases.items())}
+
+    # Method to write the summary to the file, or print it to the console
+    def dump(self):
+        summary = self.summary()
+        if self.path:
+            f = open(self.path, "a")
+            record = {"step": self.steps, "phases": summary}
+            if self.name:
+                record["name"] = self.name
+            f.write(json.dumps(record) + "\n")
+            f.close()
+            return
+
+        print(
+            "Timing" + (" of " + self.name if self.name else ""),
+            "after",
+            self.steps,
+            "steps (microseconds)",
+        )
+        print(f"  {'phase':<28}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}")
+        for name, stats in summary.items():
+            print(
+                f"  {name:<28}{stats['mean_us']:>10.1f}{stats['p50_us']:>10.1f}"
+                f"{stats['p90_us']:>10.1f}{stats['p99_us']:>10.1f}"
+            )
+
+    # Method to run cProfile over the next given number of steps
+    def profile(self, steps, path=None):
+        if self.profiler is not None:
+            return
+        self.profile_left = steps
+        self.profile_path = path
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop_profile(self):
+        self.profiler.disable()
+        if self.profile_path:
+            self.profiler.dump_stats(self.profile_path)
+        else:
+            pstats.Stats(self.profiler).sort_stats("cumulative").print_stats(25)
+        self.profiler = None
+
+    # Method to start a cProfile window whenever the process receives SIGUSR1
+    def profile_on_signal(self, steps, path=None):
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda *args: self.profile(steps, path))
+
+
+timer = PhaseTimer()  # Shared by the game, the agent and the training loops
@@ -11,7 +11,7 @@ BASE_IMG_PATH = "game_data/assets/"
 # Function to load an image from the specified path
 def load_image(path):
     img = pygame.image.load(BASE_IMG_PATH + path).convert()  # Load the image
-    img.set_colorkey((0, 0, 0))  # Set black color as transparent
+    img.set_colorkey((0, 0, 0), pygame.RLEACCEL)  # Set black color as transparent
     return img
 
 
@@ -26,32 +26,59 @@ def load_images(path):
     return images
 
 
-# Class for handling animations
-class Animation:
+# Class for the frames of an animation in both orientations, built once and shared
+class FrameBank:
     def __init__(self, images, img_dur=5, loop=True):
-        self.images = images  # List of images for the animation
+        self.images = tuple(images)  # Frames facing right
+        self.flipped = []  # Frames facing left
+        for img in self.images:
+            flipped = pygame.transform.flip(img, True, False)
+            flipped.set_colorkey(img.get_colorkey(), pygame.RLEACCEL)
+            self.flipped.append(flipped)
+        self.flipped = tuple(self.flipped)
         self.loop = loop  # Whether the animation should loop
         self.img_duration = img_dur  # Duration of each frame
+        self.length = img_dur * len(self.images)  # Frames in one loop
+
+
+# Class for handling animations, a cursor into a shared frame bank
+class Animation:
+    def __init__(self, images, img_dur=5, loop=True):
+        if isinstance(images, FrameBank):
+            self.bank = images
+        else:
+            self.bank = FrameBank(images, img_dur, loop)
         self.done = False  # Flag to indicate if the animation is complete
         self.frame = 0  # Current frame index
 
-    # Method to create a copy of the animation
+    @property
+    def images(self):
+        return self.bank.images
+
+    @property
+    def loop(self):
+        return self.bank.loop
+
+    @property
+    def img_duration(self):
+        return self.bank.img_duration
+
+    # Method to create a copy of the animation, sharing its frames
     def copy(self):
-        return Animation(self.images, self.img_duration, self.loop)
+        return Animation(self.bank)
 
     # Method to update the animation frame
     def update(self):
-        if self.loop:
+        if self.bank.loop:
             # Increment frame index and loop back if necessary
-            self.frame = (self.frame + 1) % (self.img_duration * len(self.images))
+            self.frame = (self.frame + 1) % self.bank.length
         else:
             # Increment frame index until the end of animation
-            self.frame = min(self.frame + 1, self.img_duration * len(self.images) - 1)
-            if self.frame >= self.img_duration * len(self.images) - 1:
+            self.frame = min(self.frame + 1, self.bank.length - 1)
+            if self.frame >= self.bank.length - 1:
                 self.done = True  # Mark animation as done when it reaches the end
 
-    # Method to get the current frame image
-    def img(self):
-        return self.images[
-            int(self.frame / self.img_duration)
-        ]  # Return the current frame image
+    # Method to get the current frame image, facing left if flip is set
+    def img(self, flip=False):
+        frames = self.bank.flipped if flip else self.bank.images
+        return frames[self.frame // self.bank.img_duration]
@@ -0,0 +1,138 @@
+# Importing built-in modules
+import os
+
+# Importing installed modules
+import numpy as np
+
+# Imporing other modules
+import model
+
+
+# Class for a table of Q values by state, using open addressing over NumPy arrays
+# so that whole batches of states are looked up at once
+class QTable:
+    def __init__(self, state_size, output_size, capacity=1 << 16, max_load=0.7):
+        self.state_size = state_size
+        self.output_size = output_size
+        self.max_load = max_load  # Fraction of used slots that makes the table grow
+        self.count = 0  # Number of stored states
+        # Odd multipliers for hashing the state features
+        rng = np.random.default_rng(0)
+        self.multipliers = rng.integers(0, 1 << 63, state_size, dtype=np.uint64) * 2 + 1
+        self.allocate(capacity)
+
+    def __len__(self):
+        return self.count
+
+    # Method to create empty arrays for a power of two number of slots
+    def allocate(self, capacity):
+        self.capacity = capacity
+        self.keys = np.zeros((capacity, self.state_size), dtype=np.int32)
+        self.used = np.zeros(capacity, dtype=np.bool_)
+        self.q = np.zeros((capacity, self.output_size), dtype=np.float32)
+
+    # Method to double the number of slots, inserting the stored states again
+    def grow(self):
+        keys, q = self.keys[self.used], self.q[self.used]
+        self.allocate(self.capacity * 2)
+        self.count = 0
+        self.q[self.find(keys, insert=True)] = q
+
+    # Method to get the first slot to probe for each state
+    def hash(self, keys):
+        h = (keys.astype(np.uint64) * self.multipliers).sum(axis=1, dtype=np.uint64)
+        h ^= h >> np.uint64(29)
+        return (h & np.uint64(self.capacity - 1)).astype(np.int64)
+
+    # Method to get the slots of a batch of states, -1 for states not stored,
+    # or storing them first when insert is True
+    def find(self, states, insert=False):
+        keys = np.asarray(states).reshape(-1, self.state_size).astype(np.int32)
+        if insert and self.count + len(keys) > self.max_load * self.capacity:
+            self.grow()
+            return self.find(keys, insert)
+
+        slots = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))  # States whose slot is not known yet
+        probe = self.hash(keys)
+        while len(pending):
+            used = self.used[probe]
+            found = used & (self.keys[probe] == keys[pending]).all(axis=1)
+            slots[pending[found]] = probe[found]
+            empty = ~used
+            if insert and empty.any():
+                # Only the first of the states reaching the same empty slot takes
+                # it, the others check it again on the next round
+                free, first = np.unique(probe[empty], return_index=True)
+                taken = pending[empty][first]
+                self.keys[free] = keys[taken]
+                self.used[free] = True
+                self.count += len(free)
+                slots[taken] = free
+            # Collisions move on to the next slot, misses stop unless inserting
+            probe = np.where(used, (probe + 1) & (self.capacity - 1), probe)
+            keep = slots[pending] < 0
+            if not insert:
+                keep &= used
+            pending, probe = pending[keep], probe[keep]
+        return slots
+
+    # Method to get the Q values of a state or a batch of states, zero if not stored
+    def forward(self, x):
+        slots = self.find(x)
+        q_values = np.where((slots >= 0)[:, None], self.q[slots], 0)
+        return q_values[0] if np.ndim(x) == 1 else q_values
+
+    def save(self, file_name="qtable.npz"):
+        model_folder_path = model.MODEL_FOLDER
+        if not os.path.exists(model_folder_path):
+            os.makedirs(model_folder_path)
+
+        file_name = os.path.join(model_folder_path, file_name)
+        np.savez(file_name, keys=self.keys[self.used], q=self.q[self.used])
+
+
+# Class for training a QTable with the same interface as QTrainer
+class TabularTrainer:
+    def __init__(self, table, lr, gamma):
+        self.lr = lr
+        self.gamma = gamma
+        self.table = table
+        self.td_errors = None  # TD errors of the last trained batch
+        self.updates = 0
+
+    def train_step(self, state, action, reward, next_state, done):
+        state = np.array(state)
+        if state.ndim == 1:
+            return self.train_batch(
+                state[None],
+                np.array([np.argmax(action)]),
+                np.array([reward]),
+                np.array(next_state)[None],
+                np.array([done]),
+            )
+        return self.train_batch(
+            state, np.argmax(action, axis=1), reward, next_state, done
+        )
+
+    # Method to train on a batch with actions given as indices, optionally weighting
+    # each sample. Accepts NumPy arrays or the CPU tensors of the replay buffers
+    def train_batch(self, state, action, reward, next_state, done, weights=None):
+        action = np.asarray(action)
+        reward = np.asarray(reward)
+        done = np.asarray(done, dtype=np.bool_)
+
+        slots = self.table.find(state, insert=True)
+        next_q = self.table.forward(np.asarray(next_state)).max(axis=1)
+        Q_new = reward + self.gamma * next_q * ~done
+
+        # Move the Q value of each taken action towards Q_new, repeated states
+        # and actions in a batch adding up their steps
+        self.td_errors = Q_new - self.table.q[slots, action]
+        step = self.lr * self.td_errors
+        if weights is not None:
+            step *= np.asarray(weights)
+        np.add.at(self.table.q, (slots, action), step)
+
+        self.updates += 1
+        return np.mean(self.td_errors**2)  # Mean squared TD error before the update
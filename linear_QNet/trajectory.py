@@ -0,0 +1,207 @@
+# Importing built-in modules
+import os
+import struct
+
+# Importing installed modules
+import numpy as np
+
+# Layout: a header, then blocks of block_records records, each followed by an
+# index footer. Header and footers take whole record slots, so record i of the
+# file sits at slot i + i // block_records after the header. Only records whose
+# block footer was written are read back, a torn tail is ignored
+MAGIC = b"RHTR"
+FOOTER_MAGIC = b"RHTI"
+VERSION = 1
+# Header fields: magic, version, state size, block records, slot size
+HEADER = struct.Struct("<4sIIII")
+
+
+# Function to get the record type of the transitions of a state size
+def record_dtype(state_size):
+    return np.dtype(
+        [
+            ("state", np.int32, state_size),
+            ("action", np.int8),
+            ("reward", np.float32),
+            ("done", np.bool_),
+            ("level", np.int16),
+            ("episode", np.int32),
+        ]
+    )
+
+
+# Function to get the footer type, padded to the size of a record slot
+def footer_dtype(slot_size):
+    return np.dtype(
+        {
+            "names": ["magic", "block", "count", "first_episode", "last_episode"],
+            "formats": ["S4", np.uint32, np.uint32, np.int32, np.int32],
+            "offsets": [0, 4, 8, 12, 16],
+            "itemsize": slot_size,
+        }
+    )
+
+
+# Function to get the number of record slots taken by the header
+def header_slots(slot_size):
+    return -(-HEADER.size // slot_size)
+
+
+# Class for streaming transitions to an append-only binary file, buffering a
+# block of records in memory and writing it with its footer in one go
+class TrajectoryRecorder:
+    def __init__(self, path, state_size=20, block_records=4096):
+        if os.path.exists(path):
+            raise FileExistsError(path + " exists, record to a new file")
+        self.path = path
+        self.block_records = block_records
+        self.blocks = 0  # Number of blocks written
+        self.count = 0  # Number of records in the current block
+
+        self.records = np.zeros(block_records, dtype=record_dtype(state_size))
+        self.states = self.records["state"]  # Field views, cheaper to write to
+        self.actions = self.records["action"]
+        self.rewards = self.records["reward"]
+        self.dones = self.records["done"]
+        self.levels = self.records["level"]
+        self.episodes = self.records["episode"]
+        self.footer = np.zeros(1, dtype=footer_dtype(self.records.itemsize))
+        self.footer["magic"] = FOOTER_MAGIC
+
+        slot_size = self.records.itemsize
+        header = HEADER.pack(MAGIC, VERSION, state_size, block_records, slot_size)
+        self.f = open(path, "wb")
+        self.f.write(header.ljust(header_slots(slot_size) * slot_size, b"\0"))
+
+    # Method to store one transition
+    def record(self, state, action, reward, done, level, episode):
+        self.states[self.count] = state
+        self.actions[self.count] = action
+        self.rewards[self.count] = reward
+        self.dones[self.count] = done
+        self.levels[self.count] = level
+        self.episodes[self.count] = episode
+        self.count += 1
+        if self.count == self.block_records:
+            self.flush()
+
+    # Method to store a batch of transitions
+    def record_batch(self, states, actions, rewards, dones, levels, episodes):
+        start = 0
+        while start < len(states):
+            n = min(len(states) - start, self.block_records - self.count)
+            end = self.count + n
+            self.states[self.count : end] = states[start : start + n]
+            self.actions[self.count : end] = actions[start : start + n]
+            self.rewards[self.count : end] = rewards[start : start + n]
+            self.dones[self.count : end] = dones[start : start + n]
+            self.levels[self.count : end] = levels[start : start + n]
+            self.episodes[self.count : end] = episodes[start : start + n]
+            self.count += n
+            start += n
+            if self.count == self.block_records:
+                self.flush()
+
+    # Method to write the buffered records and their footer
+    def flush(self):
+        if not self.count:
+            return
+        records = self.records[: self.count]
+        self.footer["block"] = self.blocks
+        self.footer["count"] = self.count
+        self.footer["first_episode"] = records["episode"][0]
+        self.footer["last_episode"] = records["episode"][-1]
+        self.f.write(records.tobytes())
+        self.f.write(self.footer.tobytes())
+        self.f.flush()
+        self.blocks += 1
+        self.count = 0
+
+    # Method to write the last, possibly partial, block and close the file
+    def close(self):
+        if not self.f.closed:
+            self.flush()
+            self.f.close()
+
+
+# Class for reading a recorded file through a memory map, so that slices and
+# random samples only read the records they need
+class TrajectoryReader:
+    def __init__(self, path, seed=None):
+        self.rng = np.random.default_rng(seed)
+        raw = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, version, state_size, block_records, slot_size = HEADER.unpack(
+            bytes(raw[: HEADER.size])
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(path + " is not a version " + str(VERSION) + " trajectory")
+        self.block_records = block_records
+
+        start = header_slots(slot_size) * slot_size
+        slots = (len(raw) - start) // slot_size
+        raw = raw[start : start + slots * slot_size]
+        self.slots = raw.view(record_dtype(state_size))
+        footers = raw.view(footer_dtype(slot_size))
+
+        # Full blocks, up to the first footer that is missing
+        positions = np.arange(block_records, slots, block_records + 1)
+        valid = (
+            (footers["magic"][positions] == FOOTER_MAGIC)
+            & (footers["block"][positions] == np.arange(len(positions)))
+            & (footers["count"][positions] == block_records)
+        )
+        full = len(positions) if valid.all() else int(np.argmin(valid))
+        self.footers = footers[positions[:full]]
+        self.size = full * block_records
+
+        # The last block written on close can be partial, its footer ends the file
+        rest = slots - full * (block_records + 1)
+        if rest > 1:
+            last = footers[full * (block_records + 1) + rest - 1]
+            if (
+                last["magic"] == FOOTER_MAGIC
+                and last["block"] == full
+                and last["count"] == rest - 1
+            ):
+                self.footers = np.append(self.footers, last)
+                self.size += rest - 1
+
+    def __len__(self):
+        return self.size
+
+    # Method to get records by index, slice or index array, as an in-memory copy
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            key = np.arange(*key.indices(self.size))
+        key = np.asarray(key, dtype=np.int64)
+        if key.size and (key.min() < -self.size or key.max() >= self.size):
+            raise IndexError("record index out of range")
+        if self.size:
+            key = key % self.size  # A file without records only gets empty keys
+        return self.slots[key + key // self.block_records]
+
+    # Method to sample random records
+    def sample(self, batch_size):
+        if not self.size:
+            raise ValueError("trajectory file has no records")
+        return self[self.rng.integers(0, self.size, batch_size)]
+
+    # Method to iterate over the records in order, batch_size at a time
+    def iter_batches(self, batch_size):
+        for start in range(0, self.size, batch_size):
+            yield self[start : start + batch_size]
+
+    # Method to get the records of one episode, reading only the blocks the
+    # footers say it is in
+    def episode(self, episode):
+        blocks = np.flatnonzero(
+            (self.footers["first_episode"] <= episode)
+            & (self.footers["last_episode"] >= episode)
+        )
+        if not len(blocks):
+            return self[:0]
+        records = self[
+            blocks[0]
+            * self.block_records : min((blocks[-1] + 1) * self.block_records, self.size)
+        ]
+        return records[records["episode"] == episode]
@@ -0,0 +1,48 @@
+# Importing installed modules
+import numpy as np
+
+# Imporing other modules
+from game import GameAI
+
+
+# Class for stepping several headless games in lockstep
+class VecGameAI:
+    def __init__(self, num_envs, get_state, levels=(0,), render_every=0, effects=True):
+        self.get_state = get_state  # Function turning a game into a state vector
+        self.envs = []
+        for i in range(num_envs):
+            # Only the first game is drawn when spot-checking
+            env = GameAI(
+                headless=True,
+                render_every=render_every if i == 0 else 0,
+                effects=effects,
+            )
+            env.level = levels[i % len(levels)]
+            env.load_level(env.level)
+            self.envs.append(env)
+        self.states = self.get_states()
+
+    def __len__(self):
+        return len(self.envs)
+
+    # Method to get the stacked states of all games
+    def get_states(self):
+        return np.array([self.get_state(env) for env in self.envs])
+
+    # Method to step every game with its own action, resetting the finished ones
+    def step(self, actions):
+        rewards = np.zeros(len(self.envs), dtype=np.float32)
+        levels = np.zeros(len(self.envs), dtype=np.int64)
+        dones = np.zeros(len(self.envs), dtype=np.bool_)
+        next_states = np.empty_like(self.states)
+        for i, env in enumerate(self.envs):
+            rewards[i], levels[i], dones[i] = env.play_step(action=actions[i])
+            next_states[i] = self.get_state(env)
+
+            # Skip the death and level completion animations
+            if env.dead > 1 or env.completed:
+                env.reset()
+                self.states[i] = self.get_state(env)
+            else:
+                self.states[i] = next_states[i]
+        return next_states, rewards, dones, levels